@@ -36,3 +36,5 @@ class ClipSpec:
     text_anchor: Optional[str] = None
     text_margin: Optional[int] = None
     text_anchor_slot: Optional[int] = None
+    ffmpeg_threads: Optional[int] = None  # None = padrão do ffmpeg
+    encoder: str = "cpu"  # chave de renderer_v2.ENCODERS
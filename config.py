@@ -23,6 +23,8 @@ STICKMAN_DEFAULT = "neutral"
 
 STICKMAN_SCALE = 0.6
 STICKMAN_SIZE = int(1024 * STICKMAN_SCALE)
+# PNGs do stickman já redimensionados para STICKMAN_SIZE (gerados sob demanda)
+STICKMAN_SIZED_DIR = f"{STICKMAN_DIR}/_sized"
 STICKMAN_MARGIN_X = 25
 
 STICKMAN_TEXT_SIZE = 36
@@ -46,3 +48,9 @@ FONTFILE = "/Windows/Fonts/comic.ttf"
 
 # Novo: arquivo intermediário (não destrói o SRT original)
 SRT_EDIT_FILENAME = "srt_edit.json"
+
+# Cache da duração do áudio (em output/<job>/), evita reprobe ao re-renderizar
+AUDIO_META_FILENAME = ".audio_meta.json"
+
+# Cache de clips renderizados (em output/), indexado pelo hash do ClipSpec
+CLIP_CACHE_DIRNAME = "_clip_cache"
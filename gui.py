@@ -1,19 +1,28 @@
 import os
+import queue
 import sys
 import threading
 import subprocess
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import json
 import re
 from PIL import Image, ImageTk
-from baixar_imagens_google import download_google_images
+from baixar_imagens_google import TOPIC_RE, download_google_images
+from guide_log import append_ops, dumps_json, load_guide, loads_json, needs_compaction, write_guide
 
 # ---------------- CONFIG ----------------
 DEFAULT_ROOT = "batches"
 PYTHON_EXEC = sys.executable
 SCRIPT_NAME = "main.py"
 ICON_FILE = "clipforge.ico"
+CHOOSE_DIALOG_W = 500  # diálogo "arquivo não encontrado" do organizador
+CHOOSE_DIALOG_H = 200
+TOPIC_DIALOG_W = 400  # diálogo "nome do tópico" do downloader
+TOPIC_DIALOG_H = 150
+LOG_MAX_LINES = 2000  # limite de linhas no log do downloader
+LOG_FLUSH_MS = 50  # intervalo de escrita das linhas enfileiradas no log
+PROGRESS_FLUSH_MS = 100  # no máximo ~10 atualizações/s das barras de progresso
+TOPIC_SCAN_LINES = 32  # linhas lidas procurando <topico=...> no search_terms.txt
 
 GUIDE_MODES = ["text-only", "image-only", "image-with-text"]
 TEXT_ANCHOR_OPTIONS = ["", "top", "bottom"]
@@ -30,6 +39,11 @@ STICKMAN_POSITION_OPTIONS = ["left", "right"]
 
 PROG_RE = re.compile(r"^\[(\d+)/(\d+)\s*\|\s*(\d+)%\]")
 
+# Linha da lista de triggers: "N. trigger | mode | layout | posição → ids"
+TRIGGER_ROW_FMT = "{0}. {1} | {2} | {3} | {4} → {5}".format
+# Linha de segmento no preview SRT: "início → fim  |  texto"
+SEGMENT_ROW_FMT = "{0} → {1}  |  {2}".format
+
 env = os.environ.copy()
 env["PYTHONUNBUFFERED"] = "1"
 
@@ -75,6 +89,10 @@ def _fmt_sec(sec: float) -> str:
     h = (msec // 3600000)
     return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
 
+def _fmt_segment(seg) -> str:
+    return SEGMENT_ROW_FMT(_fmt_sec(seg["start"]), _fmt_sec(seg["end"]), seg["text"])
+
+
 def _norm_text(text: str) -> str:
     return text.lower().strip()
 
@@ -100,8 +118,8 @@ def trigger_in_text(trigger: str, text: str) -> bool:
 def _safe_json_load(path: str, default):
     try:
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(path, "rb") as f:
+                return loads_json(f.read())
     except Exception:
         pass
     return default
@@ -109,8 +127,8 @@ def _safe_json_load(path: str, default):
 
 def _safe_json_save(path: str, data):
     tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    with open(tmp, "wb") as f:
+        f.write(dumps_json(data))
     os.replace(tmp, path)
 
 
@@ -534,8 +552,12 @@ class EditTab(tk.Frame):
         self.subs = None  # pysrt.SubRipFile
         self.srt_edit_path = None
         self.srt_edits = []  # list[dict]
+        self._srt_edit_pos = {}  # sub index -> posição em srt_edits
+        self._srt_edits_clean = True  # ver _srt_reindex_edits
         self._preview_segments = None
         self._current_sub = None
+        self._srt_synced_key = None  # (idx, trigger) já refletido no painel SRT
+        self._srt_sync_after_id = None
         
         # Stickman state
         self.stickman_path = None
@@ -545,6 +567,7 @@ class EditTab(tk.Frame):
 
         self._autosave_after_id = None
         self._last_selected_index = None
+        self._trigger_rows = []  # cache das linhas formatadas da lista de triggers
         self.guide_status = tk.StringVar(value="guia.json: não carregado")
 
         self._build_ui()
@@ -1116,8 +1139,7 @@ class EditTab(tk.Frame):
 
     def _load_guide(self):
         try:
-            with open(self.guide_path, 'r', encoding='utf-8') as f:
-                self.guide_data = json.load(f)
+            self.guide_data = load_guide(self.guide_path)
 
             self._refresh_trigger_list()
             self.batch_status.config(text=f"Batch {self.current_batch}: {len(self.guide_data)} triggers carregados")
@@ -1131,9 +1153,12 @@ class EditTab(tk.Frame):
         self.srt_path = None
         self.subs = None
         self.srt_edits = []
+        self._srt_edit_pos = {}
+        self._srt_edits_clean = True
         self.srt_edit_path = None
         self._current_sub = None
         self._preview_segments = None
+        self._srt_synced_key = None
 
         if not PYSRT_OK:
             return
@@ -1151,6 +1176,7 @@ class EditTab(tk.Frame):
         self.srt_path = srt_path
         self.srt_edit_path = os.path.join(base, SRT_EDIT_FILENAME)
         self.srt_edits = _safe_json_load(self.srt_edit_path, [])
+        self._srt_reindex_edits()
 
         try:
             self.subs = pysrt.open(self.srt_path, encoding="utf-8")
@@ -1325,21 +1351,53 @@ class EditTab(tk.Frame):
 
     # ---------------- TRIGGER LIST ----------------
 
-    def _refresh_trigger_list(self, restore_view=False):
+    def _format_trigger_row(self, i, item):
+        get = item.get
+        return TRIGGER_ROW_FMT(
+            i + 1,
+            get("trigger", ""),
+            self._normalize_mode(get("mode", "image-only")),
+            get("layout", "legacy_single"),
+            get("stickman_position", "left"),
+            self._format_image_ids(item),
+        )
+
+    def _refresh_trigger_list(self, restore_view=False, reformat=True):
+        """
+        Repopula a listbox. Com reformat=False reaproveita as linhas já
+        formatadas (útil quando só mudaram campos que não aparecem na lista).
+        """
         yview = self.trigger_listbox.yview() if restore_view else None
+        if reformat or len(self._trigger_rows) != len(self.guide_data):
+            fmt = self._format_trigger_row
+            self._trigger_rows = [fmt(i, item) for i, item in enumerate(self.guide_data)]
         self.trigger_listbox.delete(0, tk.END)
-        for i, item in enumerate(self.guide_data):
-            trigger = item.get("trigger", "")
-            mode = self._normalize_mode(item.get("mode", "image-only"))
-            layout = item.get("layout", "legacy_single")
-            stickman_position = item.get("stickman_position", "left")
-            image_label = self._format_image_ids(item)
-            self.trigger_listbox.insert(
-                tk.END, f"{i+1}. {trigger} | {mode} | {layout} | {stickman_position} → {image_label}"
-            )
+        if self._trigger_rows:
+            self.trigger_listbox.insert(tk.END, *self._trigger_rows)
         if yview is not None:
             self.trigger_listbox.yview_moveto(yview[0])
 
+    def _append_trigger_row(self):
+        """Adiciona só a linha do último item do guia (sem repopular a lista)."""
+        i = len(self.guide_data) - 1
+        row = self._format_trigger_row(i, self.guide_data[i])
+        self._trigger_rows.append(row)
+        self.trigger_listbox.insert(tk.END, row)
+
+    def _delete_trigger_rows(self, removed):
+        """
+        Atualiza a lista após remover os índices `removed` do guia.
+        Linhas antes do primeiro removido ficam intactas; as seguintes são
+        regravadas porque a numeração "N." muda.
+        """
+        start = min(removed)
+        fmt = self._format_trigger_row
+        tail = [fmt(i, self.guide_data[i]) for i in range(start, len(self.guide_data))]
+        self._trigger_rows[start:] = tail
+        self.trigger_listbox.delete(start, tk.END)
+        if tail:
+            self.trigger_listbox.insert(tk.END, *tail)
+
     def _on_trigger_selected(self, event):
         if self._autosave_after_id:
             self.after_cancel(self._autosave_after_id)
@@ -1405,8 +1463,8 @@ class EditTab(tk.Frame):
             image_ids = self._get_item_image_ids(item)
             self._update_preview(image_ids[0] if image_ids else "")
 
-            # Sync SRT tab
-            self._srt_sync_from_current_selection()
+            # Sync SRT tab (debounced: navegação rápida só sincroniza a última)
+            self._schedule_srt_sync()
             self._last_selected_index = idx
         else:
             # Múltipla seleção
@@ -1556,8 +1614,26 @@ class EditTab(tk.Frame):
                 return False
             idx = target_index
 
-        self.guide_data[idx]["trigger"] = self.trigger_entry.get()
+        # Valida tudo antes de mexer em guide_data: um retorno no meio deixaria
+        # o item meio alterado, e o autosave por ops nunca gravaria essa parte.
         mode = self._normalize_mode(self.mode_combo.get())
+        image_ids = self._parse_image_ids_entry(self.image_id_entry.get())
+        if mode != "text-only" and not image_ids:
+            if show_messages:
+                messagebox.showwarning("Aviso", "Informe pelo menos um Image ID para este modo.")
+            return False
+
+        margin_value = self.text_margin_entry.get().strip()
+        margin_int = None
+        if mode != "text-only" and margin_value:
+            try:
+                margin_int = int(margin_value)
+            except ValueError:
+                if show_messages:
+                    messagebox.showwarning("Aviso", "Margem inválida. Use um número inteiro.")
+                return False
+
+        self.guide_data[idx]["trigger"] = self.trigger_entry.get()
         self.guide_data[idx]["mode"] = mode
 
         layout = self.layout_combo.get() or "legacy_single"
@@ -1575,15 +1651,10 @@ class EditTab(tk.Frame):
         else:
             self.guide_data[idx].pop("stickman_position", None)
 
-        image_ids = self._parse_image_ids_entry(self.image_id_entry.get())
         if mode == "text-only":
             self.guide_data[idx].pop("image_id", None)
             self.guide_data[idx].pop("image_ids", None)
         else:
-            if not image_ids:
-                if show_messages:
-                    messagebox.showwarning("Aviso", "Informe pelo menos um Image ID para este modo.")
-                return False
             if len(image_ids) == 1:
                 self.guide_data[idx]["image_id"] = image_ids[0]
                 self.guide_data[idx].pop("image_ids", None)
@@ -1607,14 +1678,8 @@ class EditTab(tk.Frame):
             else:
                 self.guide_data[idx].pop("text_anchor", None)
 
-            margin_value = self.text_margin_entry.get().strip()
-            if margin_value:
-                try:
-                    self.guide_data[idx]["text_margin"] = int(margin_value)
-                except ValueError:
-                    if show_messages:
-                        messagebox.showwarning("Aviso", "Margem inválida. Use um número inteiro.")
-                    return False
+            if margin_int is not None:
+                self.guide_data[idx]["text_margin"] = margin_int
             else:
                 self.guide_data[idx].pop("text_margin", None)
 
@@ -1654,7 +1719,10 @@ class EditTab(tk.Frame):
         self.trigger_listbox.selection_anchor(active_index)
 
         if autosave:
-            self._save_guide(show_messages=False)
+            self._save_guide(
+                show_messages=False,
+                ops=[{"op": "set", "idx": idx, "item": self.guide_data[idx]}],
+            )
 
         if show_messages:
             messagebox.showinfo("Sucesso", "Alterações aplicadas")
@@ -1691,37 +1759,44 @@ class EditTab(tk.Frame):
                 messagebox.showwarning("Aviso", "Margem inválida. Use um número inteiro.")
                 return
 
-        for idx in sel:
-            effects = {}
+        # Patch único, montado uma vez fora do loop
+        effects = {}
+        if self.zoom_var.get():
+            effects["zoom"] = True
+        slide = self.slide_var.get()
+        if slide and slide != "none":
+            effects["slide"] = slide
 
-            if self.zoom_var.get():
-                effects["zoom"] = True
+        text_patch = {}
+        text_drop = []
+        if anchor_value:
+            text_patch["text_anchor"] = anchor_value
+        else:
+            text_drop.append("text_anchor")
+        if margin_value:
+            text_patch["text_margin"] = margin_int
+        else:
+            text_drop.append("text_margin")
 
-            slide = self.slide_var.get()
-            if slide and slide != "none":
-                effects["slide"] = slide
+        text_only = {}  # modo bruto -> é text-only?
+        for idx in sel:
+            item = self.guide_data[idx]
 
             if effects:
-                if "effects" not in self.guide_data[idx]:
-                    self.guide_data[idx]["effects"] = {}
-                self.guide_data[idx]["effects"].update(effects)
+                item.setdefault("effects", {}).update(effects)
             else:
-                if "effects" in self.guide_data[idx]:
-                    del self.guide_data[idx]["effects"]
-
-            mode = self._normalize_mode(self.guide_data[idx].get("mode", GUIDE_MODES[1]))
-            if mode != "text-only":
-                if anchor_value:
-                    self.guide_data[idx]["text_anchor"] = anchor_value
-                else:
-                    self.guide_data[idx].pop("text_anchor", None)
+                item.pop("effects", None)
 
-                if margin_value:
-                    self.guide_data[idx]["text_margin"] = margin_int
-                else:
-                    self.guide_data[idx].pop("text_margin", None)
+            raw_mode = item.get("mode", GUIDE_MODES[1])
+            if raw_mode not in text_only:
+                text_only[raw_mode] = self._normalize_mode(raw_mode) == "text-only"
+            if not text_only[raw_mode]:
+                item.update(text_patch)
+                for key in text_drop:
+                    item.pop(key, None)
 
-        self._refresh_trigger_list()
+        # effects/âncora/margem não aparecem na lista: linhas continuam válidas
+        self._refresh_trigger_list(reformat=False)
         for idx in sel:
             self.trigger_listbox.selection_set(idx)
 
@@ -1749,7 +1824,7 @@ class EditTab(tk.Frame):
                 item.pop("effects", None)
 
         self.zoom_var.set(False)
-        self._refresh_trigger_list()
+        self._refresh_trigger_list(reformat=False)
         self._srt_sync_from_current_selection()
         self._save_guide(show_messages=False)
         messagebox.showinfo("Sucesso", "Zoom desabilitado em todo o batch")
@@ -1764,8 +1839,8 @@ class EditTab(tk.Frame):
         }
 
         self.guide_data.append(new_item)
-        self._refresh_trigger_list()
-        self._save_guide(show_messages=False)
+        self._append_trigger_row()
+        self._save_guide(show_messages=False, ops=[{"op": "add", "item": new_item}])
 
         self.trigger_listbox.selection_clear(0, tk.END)
         self.trigger_listbox.selection_set(tk.END)
@@ -1784,19 +1859,23 @@ class EditTab(tk.Frame):
 
             if messagebox.askyesno("Confirmar", f"Remover trigger '{trigger}'?"):
                 del self.guide_data[idx]
-                self._refresh_trigger_list()
+                self._delete_trigger_rows([idx])
                 if self._last_selected_index == idx:
                     self._last_selected_index = None
-                self._save_guide(show_messages=False)
+                self._save_guide(show_messages=False, ops=[{"op": "del", "idx": idx}])
                 messagebox.showinfo("Sucesso", "Trigger removido")
         else:
             if messagebox.askyesno("Confirmar", f"Remover {len(sel)} triggers selecionados?"):
-                for idx in reversed(sorted(sel)):
+                removed = sorted(sel, reverse=True)
+                for idx in removed:
                     del self.guide_data[idx]
-                self._refresh_trigger_list()
+                self._delete_trigger_rows(removed)
                 if self._last_selected_index is not None:
                     self._last_selected_index = None
-                self._save_guide(show_messages=False)
+                self._save_guide(
+                    show_messages=False,
+                    ops=[{"op": "del", "idx": idx} for idx in removed],
+                )
                 messagebox.showinfo("Sucesso", f"{len(sel)} triggers removidos")
 
     def _set_guide_status(self, text: str, color: str):
@@ -1804,7 +1883,12 @@ class EditTab(tk.Frame):
         if hasattr(self, "guide_status_label"):
             self.guide_status_label.config(fg=color)
 
-    def _save_guide(self, show_messages=True):
+    def _save_guide(self, show_messages=True, ops=None):
+        """
+        Sem ops: grava o guia.json inteiro (e descarta o log de edições).
+        Com ops: só acrescenta as operações em guia.json.log; o arquivo
+        completo é regravado quando o log passa de 25% do tamanho do base.
+        """
         if not self.guide_path:
             if show_messages:
                 messagebox.showwarning("Aviso", "Nenhum guia carregado")
@@ -1812,8 +1896,12 @@ class EditTab(tk.Frame):
             return
 
         try:
-            with open(self.guide_path, 'w', encoding='utf-8') as f:
-                json.dump(self.guide_data, f, indent=2, ensure_ascii=False)
+            if ops and not show_messages:
+                append_ops(self.guide_path, ops)
+                if needs_compaction(self.guide_path):
+                    write_guide(self.guide_path, self.guide_data)
+            else:
+                write_guide(self.guide_path, self.guide_data)
 
             self._set_guide_status("guia.json atualizado", "#2e7d32")
             if show_messages:
@@ -1844,6 +1932,16 @@ class EditTab(tk.Frame):
             self.srt_trigger_entry.delete(0, "end")
         self._current_sub = None
         self._preview_segments = None
+        self._srt_synced_key = None
+
+    def _schedule_srt_sync(self):
+        if self._srt_sync_after_id:
+            self.after_cancel(self._srt_sync_after_id)
+        self._srt_sync_after_id = self.after(50, self._run_scheduled_srt_sync)
+
+    def _run_scheduled_srt_sync(self):
+        self._srt_sync_after_id = None
+        self._srt_sync_from_current_selection()
 
     def _srt_sync_from_current_selection(self):
         """Atualiza painel SRT com base no trigger selecionado no guia."""
@@ -1860,6 +1958,12 @@ class EditTab(tk.Frame):
         idx = sel[0]
         trigger = (self.guide_data[idx].get("trigger", "") or "").strip()
 
+        # mesmo item e mesmo trigger: painel já está atualizado
+        key = (idx, trigger)
+        if key == self._srt_synced_key:
+            return
+        self._srt_synced_key = key
+
         # preenche trigger no campo da aba SRT como default
         self.srt_trigger_entry.delete(0, "end")
         self.srt_trigger_entry.insert(0, trigger)
@@ -1884,9 +1988,7 @@ class EditTab(tk.Frame):
         # se já existe edit pra esse index, mostra também no preview box
         existing = self._srt_get_edit_for_index(sub.index)
         if existing:
-            lines = ["(Já existe edição em srt_edit.json)"]
-            for seg in existing.get("segments", []):
-                lines.append(f"{_fmt_sec(seg['start'])} → {_fmt_sec(seg['end'])}  |  {seg['text']}")
+            lines = ["(Já existe edição em srt_edit.json)", *map(_fmt_segment, existing.get("segments", []))]
             self._srt_set_text(self.srt_preview_box, "\n".join(lines))
         else:
             self._srt_set_text(self.srt_preview_box, "")
@@ -1904,11 +2006,35 @@ class EditTab(tk.Frame):
                 return sub
         return None
 
+    @staticmethod
+    def _srt_edit_index(e):
+        """Índice da legenda de uma edição (None se ausente ou inválido)."""
+        try:
+            return int(e["index"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _srt_reindex_edits(self):
+        self._srt_edit_pos = {}
+        # "limpo" = toda edição tem índice válido e único; só assim o mapa
+        # basta para substituir/remover no lugar (senão volta ao filtro)
+        self._srt_edits_clean = True
+        for pos, e in enumerate(self.srt_edits):
+            index = self._srt_edit_index(e)
+            if index is None or index in self._srt_edit_pos:
+                self._srt_edits_clean = False
+                if index is None:
+                    continue
+            self._srt_edit_pos.setdefault(index, pos)
+
+    def _srt_drop_edits_for(self, idx: int):
+        """Remove todas as edições do índice (inclusive duplicadas) e reindexa."""
+        self.srt_edits = [e for e in self.srt_edits if self._srt_edit_index(e) != idx]
+        self._srt_reindex_edits()
+
     def _srt_get_edit_for_index(self, index: int):
-        for e in self.srt_edits:
-            if int(e.get("index", -1)) == int(index):
-                return e
-        return None
+        pos = self._srt_edit_pos.get(int(index))
+        return self.srt_edits[pos] if pos is not None else None
 
     # ---------------- SRT actions ----------------
 
@@ -1947,11 +2073,9 @@ class EditTab(tk.Frame):
             {"start": float(t0), "end": float(split_t), "text": before},
             {"start": float(split_t), "end": float(t1), "text": second},
         ]
+        self._srt_synced_key = None
 
-        lines = []
-        for seg in self._preview_segments:
-            lines.append(f"{_fmt_sec(seg['start'])} → {_fmt_sec(seg['end'])}  |  {seg['text']}")
-        self._srt_set_text(self.srt_preview_box, "\n".join(lines))
+        self._srt_set_text(self.srt_preview_box, "\n".join(map(_fmt_segment, self._preview_segments)))
 
     def _srt_apply_edit(self):
         if not PYSRT_OK:
@@ -1979,9 +2103,19 @@ class EditTab(tk.Frame):
             "trigger_used": self.srt_trigger_entry.get().strip()
         }
 
-        # substitui se já existe
-        self.srt_edits = [e for e in self.srt_edits if int(e.get("index", -1)) != int(sub.index)]
-        self.srt_edits.append(entry)
+        # substitui no lugar se já existe
+        pos = self._srt_edit_pos.get(entry["index"])
+        if not self._srt_edits_clean:
+            # arquivo com duplicadas/sem índice: remove todas as do índice
+            self._srt_drop_edits_for(entry["index"])
+            self._srt_edit_pos[entry["index"]] = len(self.srt_edits)
+            self.srt_edits.append(entry)
+        elif pos is None:
+            self._srt_edit_pos[entry["index"]] = len(self.srt_edits)
+            self.srt_edits.append(entry)
+        else:
+            self.srt_edits[pos] = entry
+        self._srt_synced_key = None
 
         self.srt_status.config(
             text=f"SRT: {os.path.basename(self.srt_path)} | edits: {len(self.srt_edits)} (não salvo)",
@@ -2022,8 +2156,17 @@ class EditTab(tk.Frame):
         if not messagebox.askyesno("Confirmar", f"Remover edição do índice #{idx} do {SRT_EDIT_FILENAME}?"):
             return
 
-        self.srt_edits = [e for e in self.srt_edits if int(e.get("index", -1)) != idx]
+        if self._srt_edits_clean:
+            # swap-pop: o último ocupa a posição removida (ordem não importa)
+            pos = self._srt_edit_pos.pop(idx)
+            last = self.srt_edits.pop()
+            if pos < len(self.srt_edits):
+                self.srt_edits[pos] = last
+                self._srt_edit_pos[self._srt_edit_index(last)] = pos
+        else:
+            self._srt_drop_edits_for(idx)
         self._preview_segments = None
+        self._srt_synced_key = None
 
         self.srt_status.config(
             text=f"SRT: {os.path.basename(self.srt_path)} | edits: {len(self.srt_edits)} (não salvo)",
@@ -2190,6 +2333,8 @@ class FileOrganizerWindow(tk.Toplevel):
         self.pasta_var = tk.StringVar()
         self.arquivo_pendente = None
         self.arquivo_pendente_config = None
+        self._choose_dialog = None
+        self._choose_done = tk.BooleanVar(self, value=False)
 
         self._build_ui()
 
@@ -2290,69 +2435,37 @@ class FileOrganizerWindow(tk.Toplevel):
         self.log_text.configure(state="disabled")
         self.update_idletasks()
 
-    def _escolher_arquivo_manual(self, extensao, destino):
-        """Callback para escolha manual de arquivo"""
-        self.arquivo_pendente = None
-        self.arquivo_pendente_config = (extensao, destino)
-
-        # Variável para controlar a escolha
-        escolha_feita = {"path": None}
+    def _get_choose_dialog(self):
+        """Cria (uma única vez) o diálogo de escolha manual; depois só reaproveita."""
+        if self._choose_dialog is not None and self._choose_dialog.winfo_exists():
+            return self._choose_dialog
 
-        # Criar diálogo
         dialog = tk.Toplevel(self)
         dialog.title("Arquivo não encontrado")
-        dialog.geometry("500x200")
+        dialog.geometry(f"{CHOOSE_DIALOG_W}x{CHOOSE_DIALOG_H}")
         dialog.configure(bg="#c0c0c0")
         dialog.transient(self)
-        dialog.grab_set()
-        
-        # Centralizar diálogo
-        dialog.update_idletasks()
-        x = self.winfo_x() + (self.winfo_width() - dialog.winfo_width()) // 2
-        y = self.winfo_y() + (self.winfo_height() - dialog.winfo_height()) // 2
-        dialog.geometry(f"+{x}+{y}")
+        dialog.withdraw()
+        dialog.protocol("WM_DELETE_WINDOW", self._choose_pular)
 
-        tk.Label(
+        self._choose_title = tk.Label(
             dialog,
-            text=f"Arquivo não encontrado: {destino}",
             bg="#c0c0c0",
             font=("Arial", 11, "bold")
-        ).pack(pady=20)
+        )
+        self._choose_title.pack(pady=20)
 
-        tk.Label(
-            dialog,
-            text=f"Deseja escolher um arquivo .{extensao} manualmente?",
-            bg="#c0c0c0"
-        ).pack(pady=10)
+        self._choose_msg = tk.Label(dialog, bg="#c0c0c0")
+        self._choose_msg.pack(pady=10)
 
         btn_frame = tk.Frame(dialog, bg="#c0c0c0")
         btn_frame.pack(pady=20)
 
-        def escolher():
-            # Temporariamente liberar o grab para permitir filedialog
-            dialog.grab_release()
-            
-            path = filedialog.askopenfilename(
-                parent=dialog,
-                title=f"Escolher {destino}",
-                filetypes=[(f"{extensao.upper()} files", f"*.{extensao}"), ("Todos", "*.*")]
-            )
-            
-            if path:
-                escolha_feita["path"] = path
-                self._log(f"  → Arquivo escolhido: {os.path.basename(path)}")
-            
-            dialog.destroy()
-
-        def pular():
-            self._log(f"  → Pulado")
-            dialog.destroy()
-
         tk.Button(
             btn_frame,
             text="Escolher arquivo",
             width=15,
-            command=escolher,
+            command=self._choose_escolher,
             bg="#4CAF50",
             fg="white"
         ).pack(side="left", padx=10)
@@ -2361,13 +2474,60 @@ class FileOrganizerWindow(tk.Toplevel):
             btn_frame,
             text="Pular",
             width=15,
-            command=pular
+            command=self._choose_pular
         ).pack(side="left", padx=10)
 
-        # Aguardar fechamento do diálogo
-        self.wait_window(dialog)
+        self._choose_dialog = dialog
+        return dialog
+
+    def _choose_close(self):
+        self._choose_dialog.grab_release()
+        self._choose_dialog.withdraw()
+        self._choose_done.set(True)
+
+    def _choose_escolher(self):
+        extensao, destino = self.arquivo_pendente_config
+        # Temporariamente liberar o grab para permitir filedialog
+        self._choose_dialog.grab_release()
 
-        return escolha_feita["path"]
+        path = filedialog.askopenfilename(
+            parent=self._choose_dialog,
+            title=f"Escolher {destino}",
+            filetypes=[(f"{extensao.upper()} files", f"*.{extensao}"), ("Todos", "*.*")]
+        )
+
+        if path:
+            self.arquivo_pendente = path
+            self._log(f"  → Arquivo escolhido: {os.path.basename(path)}")
+
+        self._choose_close()
+
+    def _choose_pular(self):
+        self._log(f"  → Pulado")
+        self._choose_close()
+
+    def _escolher_arquivo_manual(self, extensao, destino):
+        """Callback para escolha manual de arquivo"""
+        self.arquivo_pendente = None
+        self.arquivo_pendente_config = (extensao, destino)
+
+        dialog = self._get_choose_dialog()
+        self._choose_title.config(text=f"Arquivo não encontrado: {destino}")
+        self._choose_msg.config(text=f"Deseja escolher um arquivo .{extensao} manualmente?")
+
+        # Centralizar (tamanho fixo, não precisa medir o diálogo)
+        x = self.winfo_x() + (self.winfo_width() - CHOOSE_DIALOG_W) // 2
+        y = self.winfo_y() + (self.winfo_height() - CHOOSE_DIALOG_H) // 2
+        dialog.geometry(f"+{x}+{y}")
+
+        self._choose_done.set(False)
+        dialog.deiconify()
+        dialog.grab_set()
+
+        # Aguardar escolha (o diálogo é só ocultado, não destruído)
+        self.wait_variable(self._choose_done)
+
+        return self.arquivo_pendente
 
     def _iniciar_organizacao(self):
         """Inicia processo de organização"""
@@ -2439,11 +2599,22 @@ class ImageDownloaderWindow(tk.Toplevel):
         self.transient(parent)
         self.grab_set()
 
-        self.stop_requested = False
+        # set() pelo botão Stop ou ao fechar a janela; o downloader consulta via stop_flag
+        self._stop_event = threading.Event()
+        self._stop_flag = self._stop_event.is_set
         self.worker = None
+        self._log_lines = 0
+        self._log_queue = queue.Queue()  # linhas vindas do worker (thread-safe)
+        self._log_after_id = None
+        # último (current, total) de cada barra; o worker só sobrescreve
+        # (via _set_progress) e o Tk troca o dict inteiro, ambos sob o lock
+        self._pending_progress = {}
+        self._progress_lock = threading.Lock()
+        self._progress_after_id = None
 
         # Lista de arquivos para processar
         self.files_list = []  # [{txt_path, topic_name}, ...]
+        self._paths = set()  # txt_path de files_list (dedup O(1))
 
         # ---------------- Vars ----------------
         self.dest_path = tk.StringVar()
@@ -2453,6 +2624,33 @@ class ImageDownloaderWindow(tk.Toplevel):
         self.extra_tag_freepik = tk.BooleanVar(value=False)
 
         self._build_ui()
+        self._schedule_log_drain()
+        self._progress_after_id = self.after(PROGRESS_FLUSH_MS, self._flush_progress)
+
+        # o X da barra de título passa pelo destroy() abaixo; o <Destroy>
+        # cobre qualquer outro caminho (ex: a janela principal sendo fechada)
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+        self.bind("<Destroy>", self._on_destroy, add="+")
+
+    def destroy(self):
+        self._teardown()
+        super().destroy()
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self._teardown()
+
+    def _teardown(self):
+        """Para os timers e sinaliza o worker (idempotente)."""
+        for after_id in (self._log_after_id, self._progress_after_id):
+            if after_id:
+                try:
+                    self.after_cancel(after_id)
+                except tk.TclError:
+                    pass
+        self._log_after_id = None
+        self._progress_after_id = None
+        self._stop_event.set()
 
     # ----------------------------------------------------
     # UI
@@ -2612,10 +2810,9 @@ class ImageDownloaderWindow(tk.Toplevel):
             return
 
         # Verificar se já existe na lista
-        for item in self.files_list:
-            if item["txt_path"] == path:
-                messagebox.showwarning("Aviso", "Este arquivo já está na lista.")
-                return
+        if path in self._paths:
+            messagebox.showwarning("Aviso", "Este arquivo já está na lista.")
+            return
 
         # Extrair tópico do arquivo (se existir)
         topic = self._extract_topic_from_file(path)
@@ -2631,14 +2828,18 @@ class ImageDownloaderWindow(tk.Toplevel):
             "txt_path": path,
             "topic_name": topic
         })
+        self._paths.add(path)
 
         self._refresh_files_list()
 
     def _extract_topic_from_file(self, path):
         """Tenta extrair tópico do arquivo"""
         try:
-            with open(path, encoding="utf-8") as f:
-                for line in f:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                # o cabeçalho <topico=...> fica no início do arquivo
+                for i, line in enumerate(f):
+                    if i >= TOPIC_SCAN_LINES:
+                        break
                     m = TOPIC_RE.search(line)
                     if m:
                         return m.group(1).strip()
@@ -2650,17 +2851,14 @@ class ImageDownloaderWindow(tk.Toplevel):
         """Diálogo para pedir nome do tópico"""
         dialog = tk.Toplevel(self)
         dialog.title("Nome do Tópico")
-        dialog.geometry("400x150")
+        # Centralizar (tamanho fixo, não precisa medir o diálogo)
+        x = self.winfo_x() + (self.winfo_width() - TOPIC_DIALOG_W) // 2
+        y = self.winfo_y() + (self.winfo_height() - TOPIC_DIALOG_H) // 2
+        dialog.geometry(f"{TOPIC_DIALOG_W}x{TOPIC_DIALOG_H}+{x}+{y}")
         dialog.configure(bg="#c0c0c0")
         dialog.transient(self)
         dialog.grab_set()
 
-        # Centralizar
-        dialog.update_idletasks()
-        x = self.winfo_x() + (self.winfo_width() - dialog.winfo_width()) // 2
-        y = self.winfo_y() + (self.winfo_height() - dialog.winfo_height()) // 2
-        dialog.geometry(f"+{x}+{y}")
-
         result = {"topic": None}
 
         tk.Label(
@@ -2722,6 +2920,7 @@ class ImageDownloaderWindow(tk.Toplevel):
             return
 
         idx = sel[0]
+        self._paths.discard(self.files_list[idx]["txt_path"])
         del self.files_list[idx]
         self._refresh_files_list()
 
@@ -2732,18 +2931,19 @@ class ImageDownloaderWindow(tk.Toplevel):
 
         if messagebox.askyesno("Confirmar", "Limpar todos os arquivos da lista?"):
             self.files_list.clear()
+            self._paths.clear()
             self._refresh_files_list()
 
     def _refresh_files_list(self):
         """Atualiza a listbox com a lista de arquivos"""
+        # Formato: #  |  Arquivo  |  Tópico
+        lines = [
+            f"{i:02d}  |  {os.path.basename(item['txt_path']):30s}  →  {item['topic_name']}"
+            for i, item in enumerate(self.files_list, 1)
+        ]
         self.files_listbox.delete(0, tk.END)
-
-        for i, item in enumerate(self.files_list, 1):
-            filename = os.path.basename(item["txt_path"])
-            topic = item["topic_name"]
-            # Formato: #  |  Arquivo  |  Tópico
-            line = f"{i:02d}  |  {filename:30s}  →  {topic}"
-            self.files_listbox.insert(tk.END, line)
+        if lines:
+            self.files_listbox.insert(tk.END, *lines)
 
     # ----------------------------------------------------
     # Callbacks básicos
@@ -2754,10 +2954,38 @@ class ImageDownloaderWindow(tk.Toplevel):
             self.dest_path.set(path)
 
     def _log(self, msg):
-        self.log.configure(state="normal")
-        self.log.insert("end", msg + "\n")
-        self.log.see("end")
-        self.log.configure(state="disabled")
+        """Enfileira a mensagem; pode ser chamado de qualquer thread."""
+        self._log_queue.put(msg)
+
+    def _schedule_log_drain(self):
+        self._log_after_id = self.after(LOG_FLUSH_MS, self._drain_log)
+
+    def _drain_log(self):
+        """Escreve todas as linhas pendentes num único insert."""
+        pending = []
+        try:
+            while True:
+                pending.append(self._log_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if pending:
+            text = "\n".join(pending) + "\n"
+            # só acompanha o fim se o usuário não rolou para cima
+            at_bottom = self.log.yview()[1] > 0.999
+            self.log.configure(state="normal")
+            self.log.insert("end", text)
+            self._log_lines += text.count("\n")
+            excess = self._log_lines - LOG_MAX_LINES
+            if excess > 0:
+                # descarta só as linhas mais antigas (o widget nunca é repopulado)
+                self.log.delete("1.0", f"{excess + 1}.0")
+                self._log_lines -= excess
+            if at_bottom:
+                self.log.see("end")
+            self.log.configure(state="disabled")
+
+        self._schedule_log_drain()
 
     def _update_file_progress(self, current, total):
         """Atualiza barra de progresso de arquivo"""
@@ -2774,8 +3002,24 @@ class ImageDownloaderWindow(tk.Toplevel):
         self.total_prog["maximum"] = total
         self.total_prog["value"] = current
 
-    def _stop_flag(self):
-        return self.stop_requested
+    def _set_progress(self, key, current, total):
+        """Chamado pelo worker: guarda o valor mais recente da barra `key`."""
+        with self._progress_lock:
+            self._pending_progress[key] = (current, total)
+
+    def _flush_progress(self):
+        """Aplica só o valor mais recente de cada barra (frames intermediários são descartados)."""
+        with self._progress_lock:
+            pending = self._pending_progress
+            self._pending_progress = {}
+        updaters = {
+            "file": self._update_file_progress,
+            "term": self._update_term_progress,
+            "total": self._update_total_progress,
+        }
+        for key, (current, total) in pending.items():
+            updaters[key](current, total)
+        self._progress_after_id = self.after(PROGRESS_FLUSH_MS, self._flush_progress)
 
     # ----------------------------------------------------
     # Controle de execução
@@ -2789,7 +3033,7 @@ class ImageDownloaderWindow(tk.Toplevel):
             messagebox.showwarning("Aviso", "Selecione a pasta destino.")
             return
 
-        self.stop_requested = False
+        self._stop_event.clear()
         self.btn_start.config(state="disabled")
         self.btn_resume.config(state="disabled")
         self.btn_stop.config(state="normal")
@@ -2806,7 +3050,7 @@ class ImageDownloaderWindow(tk.Toplevel):
             messagebox.showwarning("Aviso", "Selecione a pasta destino.")
             return
 
-        self.stop_requested = False
+        self._stop_event.clear()
         self.btn_start.config(state="disabled")
         self.btn_resume.config(state="disabled")
         self.btn_stop.config(state="normal")
@@ -2815,7 +3059,7 @@ class ImageDownloaderWindow(tk.Toplevel):
         self.worker.start()
 
     def _stop(self):
-        self.stop_requested = True
+        self._stop_event.set()
         self._log("[STOP] Solicitado...")
 
     def _run(self, resume):
@@ -2824,28 +3068,28 @@ class ImageDownloaderWindow(tk.Toplevel):
             total_files = len(self.files_list)
 
             for file_idx, item in enumerate(self.files_list, 1):
-                if self.stop_requested:
-                    self.after(0, self._log, f"[PARADO] no arquivo {file_idx}/{total_files}")
+                if self._stop_event.is_set():
+                    self._log(f"[PARADO] no arquivo {file_idx}/{total_files}")
                     break
 
                 txt_path = item["txt_path"]
                 topic_name = item["topic_name"]
 
-                self.after(0, self._log, f"\n{'='*60}")
-                self.after(0, self._log, f"[ARQUIVO {file_idx}/{total_files}] {os.path.basename(txt_path)}")
-                self.after(0, self._log, f"[TÓPICO] {topic_name}")
-                self.after(0, self._log, f"{'='*60}\n")
+                self._log(f"\n{'='*60}")
+                self._log(f"[ARQUIVO {file_idx}/{total_files}] {os.path.basename(txt_path)}")
+                self._log(f"[TÓPICO] {topic_name}")
+                self._log(f"{'='*60}\n")
 
-                self.after(0, self._update_file_progress, file_idx, total_files)
+                self._set_progress("file", file_idx, total_files)
 
                 # Callback de progresso customizado para cada arquivo
                 def on_progress(term_idx, total_terms, img_idx, imgs_per_term, term_label):
-                    self.after(0, self._update_term_progress, img_idx, imgs_per_term)
-                    
+                    self._set_progress("term", img_idx, imgs_per_term)
+
                     # Progresso total = arquivos * termos
                     global_current = (file_idx - 1) * 100 + (term_idx * 100 // total_terms)
                     global_total = total_files * 100
-                    self.after(0, self._update_total_progress, global_current, global_total)
+                    self._set_progress("total", global_current, global_total)
 
                 extra_tags = []
                 if self.extra_tag_wikipedia_cc.get():
@@ -2862,21 +3106,21 @@ class ImageDownloaderWindow(tk.Toplevel):
                     extra_query_tags=extra_tags,
                     resume=resume,
                     speed=self.download_speed.get(),
-                    on_log=lambda s: self.after(0, self._log, s),
+                    on_log=self._log,
                     on_progress=on_progress,
                     stop_flag=self._stop_flag,
                 )
 
             # Concluído
-            if not self.stop_requested:
-                self.after(0, self._log, f"\n{'='*60}")
-                self.after(0, self._log, "[CONCLUÍDO] Todos os arquivos foram processados!")
-                self.after(0, self._log, f"{'='*60}")
-                self.after(0, self._update_total_progress, total_files * 100, total_files * 100)
+            if not self._stop_event.is_set():
+                self._log(f"\n{'='*60}")
+                self._log("[CONCLUÍDO] Todos os arquivos foram processados!")
+                self._log(f"{'='*60}")
+                self._set_progress("total", total_files * 100, total_files * 100)
 
         except Exception as e:
             self.after(0, messagebox.showerror, "Erro", str(e))
-            self.after(0, self._log, f"[ERRO] {e}")
+            self._log(f"[ERRO] {e}")
         finally:
             self.after(0, self._on_finish)
 
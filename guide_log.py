@@ -0,0 +1,123 @@
+import json
+import os
+from typing import Any, Dict, List
+
+# orjson (opcional) codifica/decodifica bem mais rápido; o fallback usa o json
+# da stdlib com a mesma formatação (indent=2, sem escapar acentos).
+try:
+    import orjson  # type: ignore
+
+    def loads_json(data: bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps_json(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    def _dumps_line(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    orjson = None
+
+    def loads_json(data: bytes) -> Any:
+        return json.loads(data)
+
+    def dumps_json(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def _dumps_line(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+# Log de edições do guia.json (JSONL ao lado do arquivo base).
+# A primeira linha identifica o guia.json sobre o qual o log foi gravado;
+# se o base mudar (compactação, edição externa), o log antigo é ignorado.
+GUIDE_LOG_SUFFIX = ".log"
+COMPACT_RATIO = 0.25
+
+
+def guide_log_path(guide_path: str) -> str:
+    return guide_path + GUIDE_LOG_SUFFIX
+
+
+def _base_stamp(guide_path: str) -> Dict[str, int]:
+    st = os.stat(guide_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _apply_op(guide: List[Dict[str, Any]], op: Dict[str, Any]) -> None:
+    kind = op.get("op")
+    if kind == "add":
+        guide.append(op["item"])
+    elif kind == "set":
+        idx = int(op["idx"])
+        if 0 <= idx < len(guide):
+            guide[idx] = op["item"]
+    elif kind == "del":
+        idx = int(op["idx"])
+        if 0 <= idx < len(guide):
+            del guide[idx]
+
+
+def _log_is_current(guide_path: str) -> bool:
+    """True se o log existe e foi gravado sobre o guia.json atual."""
+    log_path = guide_log_path(guide_path)
+    if not os.path.exists(log_path):
+        return False
+    with open(log_path, "r", encoding="utf-8") as f:
+        first = f.readline()
+    try:
+        header = json.loads(first)
+    except ValueError:
+        return False
+    return isinstance(header, dict) and header.get("base") == _base_stamp(guide_path)
+
+
+def load_guide(guide_path: str) -> List[Dict[str, Any]]:
+    """Lê guia.json e reaplica o log de edições pendentes (se válido)."""
+    with open(guide_path, "rb") as f:
+        guide = loads_json(f.read())
+
+    if not _log_is_current(guide_path):
+        return guide
+
+    with open(guide_log_path(guide_path), "rb") as f:
+        lines = f.read().splitlines()
+    for line in lines[1:]:
+        try:
+            _apply_op(guide, loads_json(line))
+        except (ValueError, KeyError, TypeError):
+            # linha truncada (ex: crash no meio do append) encerra o replay
+            break
+    return guide
+
+
+def append_ops(guide_path: str, ops: List[Dict[str, Any]]) -> None:
+    """Acrescenta operações ao log (cria o cabeçalho se necessário)."""
+    chunks = []
+    mode = "ab"
+    if not _log_is_current(guide_path):
+        # log novo (ou obsoleto): recomeça com o cabeçalho do base atual
+        mode = "wb"
+        chunks.append(_dumps_line({"base": _base_stamp(guide_path)}))
+    chunks.extend(_dumps_line(op) for op in ops)
+    with open(guide_log_path(guide_path), mode) as f:
+        f.write(b"\n".join(chunks) + b"\n")
+
+
+def needs_compaction(guide_path: str) -> bool:
+    log_path = guide_log_path(guide_path)
+    if not os.path.exists(log_path):
+        return False
+    base_size = max(1, os.path.getsize(guide_path))
+    return os.path.getsize(log_path) > base_size * COMPACT_RATIO
+
+
+def write_guide(guide_path: str, guide: List[Dict[str, Any]]) -> None:
+    """Grava o guia completo (tmp + rename) e descarta o log."""
+    tmp = guide_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(dumps_json(guide))
+    os.replace(tmp, guide_path)
+
+    log_path = guide_log_path(guide_path)
+    if os.path.exists(log_path):
+        os.remove(log_path)
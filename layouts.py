@@ -15,7 +15,9 @@ from config import (
 )
 
 
-@dataclass
+# Resultados são imutáveis: cada combinação é construída uma única vez
+# (ver _LAYOUT_TABLE) e compartilhada entre todos os clips.
+@dataclass(frozen=True, slots=True)
 class ImageSlot:
     target_w: int
     target_h: int
@@ -23,10 +25,10 @@ class ImageSlot:
     y_expr: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LayoutResult:
     name: str
-    image_slots: List[ImageSlot]
+    image_slots: Tuple[ImageSlot, ...]
     stickman_pos: Optional[Tuple[str, str]]
 
 def _normalize_stickman_side(stickman_side: str) -> str:
@@ -72,19 +74,19 @@ def _legacy_single(use_stickman: bool, stickman_side: str) -> LayoutResult:
 
     stickman_pos = _stickman_position(use_stickman, stickman_side)
 
-    return LayoutResult(name="legacy_single", image_slots=[slot], stickman_pos=stickman_pos)
+    return LayoutResult(name="legacy_single", image_slots=(slot,), stickman_pos=stickman_pos)
 
 
 def _image_center_only() -> LayoutResult:
     slot = ImageSlot(target_w=OUT_W, target_h=SAFE_H, x_expr="(W-w)/2", y_expr="(H-h)/2")
-    return LayoutResult(name="image_center_only", image_slots=[slot], stickman_pos=None)
+    return LayoutResult(name="image_center_only", image_slots=(slot,), stickman_pos=None)
 
 
 def _stickman_center_only(use_stickman: bool) -> LayoutResult:
     stickman_pos = None
     if use_stickman:
         stickman_pos = ("(W-w)/2", "(H-h)/2")
-    return LayoutResult(name="stickman_center_only", image_slots=[], stickman_pos=stickman_pos)
+    return LayoutResult(name="stickman_center_only", image_slots=(), stickman_pos=stickman_pos)
 
 
 def _two_images_center(use_stickman: bool, stickman_side: str) -> LayoutResult:
@@ -101,10 +103,10 @@ def _two_images_center(use_stickman: bool, stickman_side: str) -> LayoutResult:
     right_x = left_x + slot_w + gap
     y_expr = "(H-h)/2"
 
-    slots = [
+    slots = (
         ImageSlot(target_w=slot_w, target_h=slot_h, x_expr=str(left_x), y_expr=y_expr),
         ImageSlot(target_w=slot_w, target_h=slot_h, x_expr=str(right_x), y_expr=y_expr),
-    ]
+    )
     stickman_pos = _stickman_position(use_stickman, stickman_side)
 
     return LayoutResult(name="two_images_center", image_slots=slots, stickman_pos=stickman_pos)
@@ -119,64 +121,93 @@ def _stickman_left_3img(use_stickman: bool, stickman_side: str) -> LayoutResult:
     top_y = int((OUT_H - total_h) / 2)
     x_expr = f"{content_x}+({content_w}-{slot_w})/2"
 
-    slots = [
+    slots = (
         ImageSlot(target_w=slot_w, target_h=slot_h, x_expr=x_expr, y_expr=str(top_y)),
         ImageSlot(target_w=slot_w, target_h=slot_h, x_expr=x_expr, y_expr=str(top_y + slot_h + gap)),
         ImageSlot(target_w=slot_w, target_h=slot_h, x_expr=x_expr, y_expr=str(top_y + (slot_h + gap) * 2)),
-    ]
+    )
     stickman_pos = _stickman_position(use_stickman, stickman_side)
 
     return LayoutResult(name="stickman_left_3img", image_slots=slots, stickman_pos=stickman_pos)
 
 
-def resolve_layout(
-    layout_name: str,
+LAYOUT_NAMES = (
+    "legacy_single",
+    "image_center_only",
+    "stickman_center_only",
+    "two_images_center",
+    "stickman_left_3img",
+)
+
+
+def _build_layout(
+    normalized: str,
     use_stickman: bool,
-    image_count: int,
-    stickman_side: str = "left",
-) -> Tuple[LayoutResult, List[str]]:
+    side: str,
+) -> Tuple[LayoutResult, Tuple[str, ...], bool]:
+    """
+    Layout + avisos fixos de uma combinação (nome, stickman, lado).
+    O bool indica se o aviso de imagens insuficientes ainda se aplica.
+    """
     warnings: List[str] = []
-    normalized = (layout_name or "legacy_single").strip().lower()
-    normalized_side = _normalize_stickman_side(stickman_side)
 
     if normalized == "image_center_only":
-        layout = _image_center_only()
         if use_stickman:
             warnings.append("Layout image_center_only ignora stickman.")
-        if use_stickman and normalized_side == "right":
+        if use_stickman and side == "right":
             warnings.append("Stickman à direita ignorado (layout image_center_only).")
-        if image_count < len(layout.image_slots):
-            warnings.append(
-                f"Imagens insuficientes para layout {layout.name}. "
-                f"Esperado {len(layout.image_slots)}, recebido {image_count}."
-            )
-        return layout, warnings
+        return _image_center_only(), tuple(warnings), True
 
     if normalized == "stickman_center_only":
         if not use_stickman:
             warnings.append("Layout stickman_center_only sem stickman. Usando legacy_single.")
-            return _legacy_single(use_stickman=False, stickman_side=normalized_side), warnings
-        if normalized_side == "right":
+            return _legacy_single(use_stickman=False, stickman_side=side), tuple(warnings), False
+        if side == "right":
             warnings.append("Stickman à direita ignorado (layout stickman_center_only).")
-        return _stickman_center_only(use_stickman=True), warnings
+        return _stickman_center_only(use_stickman=True), tuple(warnings), False
 
     if normalized == "two_images_center":
-        layout = _two_images_center(use_stickman=use_stickman, stickman_side=normalized_side)
-    elif normalized == "stickman_left_3img":
+        return _two_images_center(use_stickman=use_stickman, stickman_side=side), (), True
+
+    if normalized == "stickman_left_3img":
         if not use_stickman:
             warnings.append("Layout stickman_left_3img sem stickman. Usando legacy_single.")
-            return _legacy_single(use_stickman=False, stickman_side=normalized_side), warnings
-        layout = _stickman_left_3img(use_stickman=True, stickman_side=normalized_side)
-    elif normalized == "legacy_single":
-        layout = _legacy_single(use_stickman=use_stickman, stickman_side=normalized_side)
+            return _legacy_single(use_stickman=False, stickman_side=side), tuple(warnings), False
+        return _stickman_left_3img(use_stickman=True, stickman_side=side), (), True
+
+    return _legacy_single(use_stickman=use_stickman, stickman_side=side), (), True
+
+
+# Todas as combinações possíveis (5 layouts x stickman x lado) são avaliadas
+# uma vez na importação; resolve_layout só faz a busca e o aviso de contagem.
+_LAYOUT_TABLE = {
+    (name, use_stickman, side): _build_layout(name, use_stickman, side)
+    for name in LAYOUT_NAMES
+    for use_stickman in (False, True)
+    for side in ("left", "right")
+}
+
+
+def resolve_layout(
+    layout_name: str,
+    use_stickman: bool,
+    image_count: int,
+    stickman_side: str = "left",
+) -> Tuple[LayoutResult, Tuple[str, ...]]:
+    normalized = (layout_name or "legacy_single").strip().lower()
+    normalized_side = _normalize_stickman_side(stickman_side)
+
+    entry = _LAYOUT_TABLE.get((normalized, bool(use_stickman), normalized_side))
+    if entry is None:
+        layout, warnings, check_count = _LAYOUT_TABLE[("legacy_single", bool(use_stickman), normalized_side)]
+        warnings = (f"Layout desconhecido '{layout_name}'. Usando legacy_single.",) + warnings
     else:
-        warnings.append(f"Layout desconhecido '{layout_name}'. Usando legacy_single.")
-        layout = _legacy_single(use_stickman=use_stickman, stickman_side=normalized_side)
+        layout, warnings, check_count = entry
 
-    if image_count < len(layout.image_slots):
-        warnings.append(
+    if check_count and image_count < len(layout.image_slots):
+        warnings = warnings + (
             f"Imagens insuficientes para layout {layout.name}. "
-            f"Esperado {len(layout.image_slots)}, recebido {image_count}."
+            f"Esperado {len(layout.image_slots)}, recebido {image_count}.",
         )
 
     return layout, warnings
@@ -2,45 +2,89 @@ import os
 import re
 import json
 import argparse
+import hashlib
+import shutil
 import subprocess
 import sys
-from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+import time
+import unicodedata
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
 
-import pysrt
 from unidecode import unidecode
 
+# mutagen (opcional) lê a duração direto do container, sem subir um ffprobe
+try:
+    import mutagen  # type: ignore
+    MUTAGEN_OK = True
+except Exception:
+    mutagen = None
+    MUTAGEN_OK = False
+
+# pyahocorasick (opcional) casa todos os triggers numa única passada por legenda
+try:
+    import ahocorasick  # type: ignore
+    AHOCORASICK_OK = True
+except Exception:
+    ahocorasick = None
+    AHOCORASICK_OK = False
+
 from clip_specs import ClipSpec, ImageLayer, StickmanAnim, StickmanLayer
 from config import (
     AUDIO_EXTENSIONS,
+    AUDIO_META_FILENAME,
+    CLIP_CACHE_DIRNAME,
     END_PAD_SECONDS,
+    FONTFILE,
     FPS,
     OUT_H,
     OUT_W,
     SRT_EDIT_FILENAME,
     STICKMAN_DEFAULT,
     STICKMAN_DIR,
+    STICKMAN_SIZE,
+    STICKMAN_SIZED_DIR,
     VALID_EXTS,
 )
+from guide_log import load_guide, loads_json
 from layouts import resolve_layout
-from renderer_v2 import render_clip
+from renderer_v2 import ENCODERS, render_clip, resolve_encoder
 from png_to_jpg import convert_pngs_in_batches
+from PIL import Image
 
 # =============================================================================
 # Console-safe printing (Windows cp1252 friendly)
 # =============================================================================
 
+# Caracteres fora do encoding do console viram "?" direto no stdout
+# (sem exceção + retry por linha).
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(errors="replace")
+
+PRINT_FLUSH_S = 0.1
+_last_flush = 0.0
+
 def print_safe(s: str):
     """
     Print that won't crash on Windows consoles with legacy encodings (e.g., cp1252).
-    Always flushes, so GUI can read progress in real time.
+    Progress lines ("[i/n | p%]") always flush, so the GUI reads them in real
+    time; other lines are flushed at most every PRINT_FLUSH_S seconds.
     """
+    global _last_flush
     try:
-        print(s, flush=True)
+        sys.stdout.write(s + "\n")
     except UnicodeEncodeError:
         enc = sys.stdout.encoding or "cp1252"
         safe = s.encode(enc, errors="replace").decode(enc, errors="replace")
-        print(safe, flush=True)
+        sys.stdout.write(safe + "\n")
+
+    now = time.monotonic()
+    if (s.startswith("[") and "%]" in s) or now - _last_flush >= PRINT_FLUSH_S:
+        sys.stdout.flush()
+        _last_flush = now
 
 # =============================================================================
 # MODELOS
@@ -57,22 +101,201 @@ class JobPaths:
     srt: str
     output_root: str
     output_dir: str   # output/<job>/clips
+
+@dataclass(frozen=True, slots=True)
+class GuideItem:
+    """Item do guia.json já validado/normalizado (ver parse_guide_item)."""
+    trigger: str
+    mode: str
+    layout: Any
+    image_ids: Tuple[str, ...]
+    effects: Dict[str, Any]
+    text: Any = None
+    text_anchor: Any = None
+    text_margin: Any = None
+    stickman_anim: Any = None
+    stickman_position: Any = None
 
 # =============================================================================
 # UTILS
 # =============================================================================
 
+def _build_accent_table() -> Dict[int, str]:
+    """Letra acentuada (latim, até U+024F) -> letra base ASCII.
+
+    Só entram caracteres que decompõem em letra ASCII + marcas combinantes
+    (á, ç, õ...): para esses o resultado é idêntico ao do unidecode.
+    """
+    table: Dict[int, str] = {}
+    for code in range(0x80, 0x250):
+        decomposed = unicodedata.normalize("NFKD", chr(code))
+        base = decomposed[0]
+        if (
+            len(decomposed) > 1
+            and base.isascii()
+            and base.isalpha()
+            and all(unicodedata.combining(c) for c in decomposed[1:])
+        ):
+            table[code] = base
+    return table
+
+_ACCENT_TABLE = _build_accent_table()
+
+@lru_cache(maxsize=65536)
 def norm(text: str) -> str:
-    return unidecode(text.lower()).strip()
+    text = text.lower()
+    # texto só ASCII (maioria dos casos) não precisa passar pelo unidecode
+    if text.isascii():
+        return text.strip()
+    # acentos comuns do português saem com str.translate (nível C); o
+    # unidecode fica só para o que sobrar fora da tabela (ß, æ, emoji...)
+    stripped = text.translate(_ACCENT_TABLE)
+    if stripped.isascii():
+        return stripped.strip()
+    return unidecode(text).strip()
+
+@lru_cache(maxsize=4096)
+def _trigger_pattern(t: str) -> "re.Pattern[str]":
+    return re.compile(rf"\b{re.escape(t)}\b")
 
 def trigger_in_text(trigger: str, text: str) -> bool:
-    t = norm(trigger)
-    s = norm(text)
-    if " " in t:
-        return t in s
-    return re.search(rf"\b{re.escape(t)}\b", s) is not None
+    return trigger_in_norm_text(norm(trigger), norm(text))
+
+def trigger_in_norm_text(t_norm: str, s_norm: str) -> bool:
+    """Como trigger_in_text, para trigger e texto já normalizados."""
+    if " " in t_norm:
+        return t_norm in s_norm
+    return _trigger_pattern(t_norm).search(s_norm) is not None
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+def _at_word_boundary(s: str, i: int) -> bool:
+    """Equivalente ao \\b do regex na posição i de s."""
+    before = i > 0 and _is_word_char(s[i - 1])
+    after = i < len(s) and _is_word_char(s[i])
+    return before != after
 
-def get_audio_duration(path: str) -> float:
+_WORD_RE = re.compile(r"\w+")
+
+@dataclass
+class SubIndex:
+    """
+    Índice invertido das legendas efetivas:
+    - norm_texts: texto normalizado de cada legenda
+    - postings: palavra -> índices (crescentes) das legendas que a contêm
+    """
+    norm_texts: List[str]
+    postings: Dict[str, List[int]]
+
+def build_sub_index(texts: List[str]) -> SubIndex:
+    norm_texts = [norm(text) for text in texts]
+    postings: Dict[str, List[int]] = {}
+    for i, s in enumerate(norm_texts):
+        for word in set(_WORD_RE.findall(s)):
+            postings.setdefault(word, []).append(i)
+    return SubIndex(norm_texts, postings)
+
+def _required_words(t: str) -> List[str]:
+    """
+    Palavras do trigger que aparecem inteiras em qualquer legenda que o contém.
+    Sem espaço (casa com \\b nas pontas): todas. Frase (substring): só as
+    internas, já que a primeira/última podem casar só um pedaço da palavra.
+    """
+    if " " not in t:
+        return _WORD_RE.findall(t)
+    return [m.group() for m in _WORD_RE.finditer(t) if m.start() > 0 and m.end() < len(t)]
+
+def sub_matches(index: SubIndex, trigger: str) -> Iterator[int]:
+    """Índices (em ordem) das legendas em que trigger_in_text(trigger, texto) vale."""
+    t = norm(trigger)
+    candidates: Iterable[int] = range(len(index.norm_texts))
+    words = _required_words(t)
+    if words:
+        # filtra pela palavra mais rara e só confirma esses candidatos
+        candidates = min((index.postings.get(w, []) for w in words), key=len)
+    for i in candidates:
+        if trigger_in_norm_text(t, index.norm_texts[i]):
+            yield i
+
+def first_trigger_matches(triggers: List[str], index: SubIndex) -> Dict[str, int]:
+    """
+    Para cada trigger (já normalizado), índice da primeira legenda que o contém,
+    com a mesma regra de trigger_in_text. Triggers sem ocorrência ficam de fora.
+    """
+    pending = set(triggers)
+    found: Dict[str, int] = {}
+    if not pending:
+        return found
+    norm_texts = index.norm_texts
+
+    if AHOCORASICK_OK and "" not in pending:
+        automaton = ahocorasick.Automaton()
+        for t in pending:
+            automaton.add_word(t, t)
+        automaton.make_automaton()
+        for i, s in enumerate(norm_texts):
+            for end, t in automaton.iter(s):
+                if t in found:
+                    continue
+                start = end - len(t) + 1
+                # frases (com espaço) casam como substring; palavras exigem \b
+                if " " in t or (_at_word_boundary(s, start) and _at_word_boundary(s, end + 1)):
+                    found[t] = i
+            if len(found) == len(pending):
+                break
+        return found
+
+    for t in pending:
+        i = next(sub_matches(index, t), None)
+        if i is not None:
+            found[t] = i
+    return found
+
+def get_audio_duration(path: str, meta_path: Optional[str] = None) -> float:
+    """
+    Duração do áudio em segundos. Memoizada por (path, tamanho, mtime) e,
+    se meta_path for informado, persistida em disco entre execuções.
+    """
+    st = os.stat(path)
+    if meta_path:
+        try:
+            with open(meta_path, "rb") as f:
+                meta = loads_json(f.read())
+            if (meta.get("path") == os.path.abspath(path)
+                    and meta.get("size") == st.st_size
+                    and meta.get("mtime_ns") == st.st_mtime_ns):
+                return float(meta["duration"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+    duration = _audio_duration(path, st.st_size, st.st_mtime_ns)
+
+    if meta_path:
+        try:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "path": os.path.abspath(path),
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "duration": duration,
+                }, f)
+        except OSError:
+            pass
+    return duration
+
+@lru_cache(maxsize=256)
+def _audio_duration(path: str, size: int, mtime_ns: int) -> float:
+    if MUTAGEN_OK:
+        try:
+            f = mutagen.File(path)
+            if f is not None and f.info and f.info.length:
+                return float(f.info.length)
+        except Exception:
+            pass
+    return _ffprobe_audio_duration(path)
+
+def _ffprobe_audio_duration(path: str) -> float:
     r = subprocess.run(
         ["ffprobe", "-v", "error",
          "-show_entries", "format=duration",
@@ -81,34 +304,85 @@ def get_audio_duration(path: str) -> float:
     )
     return float(r.stdout.strip())
 
+def get_audio_codec(path: str) -> str:
+    """codec_name do primeiro stream de áudio ("" se o ffprobe falhar)."""
+    st = os.stat(path)
+    return _audio_codec(path, st.st_size, st.st_mtime_ns)
+
+@lru_cache(maxsize=256)
+def _audio_codec(path: str, size: int, mtime_ns: int) -> str:
+    r = subprocess.run(
+        ["ffprobe", "-v", "error",
+         "-select_streams", "a:0",
+         "-show_entries", "stream=codec_name",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True, text=True
+    )
+    return r.stdout.strip().lower() if r.returncode == 0 else ""
+
+@lru_cache(maxsize=32)
+def _list_dir(folder: str) -> Tuple[str, ...]:
+    """Nomes do diretório (uma única varredura por pasta durante a execução)."""
+    with os.scandir(folder) as it:
+        return tuple(entry.name for entry in it)
+
 def find_audio_file(folder: str) -> Optional[str]:
+    names = _list_dir(folder)
+    present = set(names)
     # prioriza "audio.ext" se existir
     for ext in AUDIO_EXTENSIONS:
-        p = os.path.join(folder, f"audio{ext}")
-        if os.path.exists(p):
-            return p
+        if f"audio{ext}" in present:
+            return os.path.join(folder, f"audio{ext}")
     # senão, primeiro arquivo de áudio encontrado
-    for f in os.listdir(folder):
-        if f.lower().endswith(tuple(AUDIO_EXTENSIONS)):
+    audio_exts = tuple(AUDIO_EXTENSIONS)
+    for f in names:
+        if f.lower().endswith(audio_exts):
             return os.path.join(folder, f)
     return None
 
 def find_srt_file(folder: str) -> Optional[str]:
+    names = _list_dir(folder)
     # prioriza audio.srt
-    preferred = os.path.join(folder, "audio.srt")
-    if os.path.exists(preferred):
-        return preferred
-    for f in os.listdir(folder):
+    if "audio.srt" in names:
+        return os.path.join(folder, "audio.srt")
+    for f in names:
         if f.lower().endswith(".srt"):
             return os.path.join(folder, f)
     return None
 
+@lru_cache(maxsize=32)
+def _image_index(images_dir: str) -> Tuple[Dict[str, str], Tuple[str, ...]]:
+    """
+    Índice das imagens válidas da pasta:
+    - dict prefixo numérico -> caminho (primeiro arquivo na ordem do diretório)
+    - nomes válidos, para IDs não numéricos
+    """
+    by_digits: Dict[str, str] = {}
+    names = []
+    for f in _list_dir(images_dir):
+        if not f.lower().endswith(VALID_EXTS):
+            continue
+        names.append(f)
+        # prefixo de dígitos seguido de não-dígito (ex: "12_foto.jpg" -> "12")
+        n = 0
+        while n < len(f) and f[n].isdecimal():
+            n += 1
+        if 0 < n < len(f):
+            by_digits.setdefault(f[:n], os.path.join(images_dir, f))
+    return by_digits, tuple(names)
+
 def find_image_by_id(images_dir: str, image_id: str) -> Optional[str]:
-    for f in os.listdir(images_dir):
-        if f.lower().endswith(VALID_EXTS) and re.match(rf"^{re.escape(image_id)}\D", f):
+    by_digits, names = _image_index(images_dir)
+    if image_id.isdecimal():
+        return by_digits.get(image_id)
+    # ID com letras/underscore: nome começa com o ID seguido de não-dígito
+    n = len(image_id)
+    for f in names:
+        if f.startswith(image_id) and len(f) > n and not f[n].isdecimal():
             return os.path.join(images_dir, f)
     return None
 
+@lru_cache(maxsize=None)
 def find_stickman_by_name(name: str) -> Optional[str]:
     p = os.path.join(STICKMAN_DIR, f"{name}.png")
     if os.path.exists(p):
@@ -116,48 +390,116 @@ def find_stickman_by_name(name: str) -> Optional[str]:
     fallback = os.path.join(STICKMAN_DIR, f"{STICKMAN_DEFAULT}.png")
     return fallback if os.path.exists(fallback) else None
 
+@lru_cache(maxsize=None)
+def presized_stickman(path: str) -> str:
+    """
+    Cópia do PNG do stickman já em STICKMAN_SIZE x STICKMAN_SIZE.
+    O ffmpeg decodifica o stickman a cada frame (-loop 1); com a imagem menor
+    o decode fica mais barato e o scale do filtro quase não tem trabalho.
+    Se não der para gerar a cópia, usa o original.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    sized = os.path.join(STICKMAN_SIZED_DIR, f"{name}_{STICKMAN_SIZE}.png")
+    try:
+        if os.stat(sized).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return sized
+    except OSError:
+        pass
+
+    try:
+        os.makedirs(STICKMAN_SIZED_DIR, exist_ok=True)
+        tmp = f"{sized}.{os.getpid()}.tmp"
+        with Image.open(path) as img:
+            img.convert("RGBA").resize((STICKMAN_SIZE, STICKMAN_SIZE), Image.LANCZOS).save(tmp, "PNG")
+        os.replace(tmp, sized)
+    except OSError as e:
+        print_safe(f"[WARN] Falha ao redimensionar stickman {path}: {e}")
+        return path
+    return sized
+
 # =============================================================================
 # SRT EDIT (merge virtual subs)
 # =============================================================================
 
-class _VirtualTime:
-    def __init__(self, seconds: float):
-        self.ordinal = int(round(seconds * 1000.0))
+@dataclass
+class SubTimeline:
+    """
+    Legendas efetivas em colunas paralelas (sem um objeto por legenda):
+    - starts_ms / ends_ms: tempos em ms
+    - texts: texto de cada legenda
+    """
+    starts_ms: array
+    ends_ms: array
+    texts: List[str]
+
+    def __len__(self) -> int:
+        return len(self.texts)
 
-class _VirtualSub:
+_SRT_TIME_SEP_RE = re.compile(r"[,.:]")
+
+def _srt_time_ms(value: str) -> int:
+    h, m, s, ms = (int(p) for p in _SRT_TIME_SEP_RE.split(value.strip()))
+    return ((h * 60 + m) * 60 + s) * 1000 + ms
+
+def parse_srt(path: str) -> List[Tuple[Optional[int], int, int, str]]:
     """
-    Subtítulo "virtual" compatível com o que o código já espera:
-    - .text
-    - .start.ordinal (ms)
-    - .end.ordinal (ms)
-    - .index (int)
+    Lê o SRT como (index, start_ms, end_ms, texto), com as regras do pysrt:
+    blocos separados por linha em branco, índice opcional, texto multi-linha.
+    Blocos inválidos são ignorados. Bloco sem índice fica com index None
+    (como no pysrt), para nunca casar com uma edição do srt_edit.json.
     """
-    def __init__(self, index: int, start_s: float, end_s: float, text: str):
-        self.index = index
-        self.start = _VirtualTime(start_s)
-        self.end = _VirtualTime(end_s)
-        self.text = text
+    with open(path, "r", encoding="utf-8-sig") as f:
+        lines = f.read().split("\n")
+    lines.append("")
+
+    cues: List[Tuple[Optional[int], int, int, str]] = []
+    block: List[str] = []
+    for line in lines:
+        if line.strip():
+            block.append(line.rstrip())
+            continue
+        if len(block) >= 2:
+            index_str = block.pop(0) if "-->" not in block[0] else None
+            try:
+                start, end = block[0].split("-->", 1)
+                start_ms = _srt_time_ms(start)
+                end_ms = _srt_time_ms(end.split()[0])
+                index = int(index_str) if index_str is not None else None
+            except (ValueError, IndexError):
+                block = []
+                continue
+            cues.append((index, start_ms, end_ms, "\n".join(block[1:])))
+        block = []
+    return cues
 
 def _load_srt_edits(edit_path: str) -> List[dict]:
     try:
         if os.path.exists(edit_path):
-            with open(edit_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(edit_path, "rb") as f:
+                data = loads_json(f.read())
             if isinstance(data, list):
                 return data
     except Exception:
         pass
     return []
 
-def apply_srt_edits(subs: pysrt.SubRipFile, edit_path: str) -> List[Any]:
+def apply_srt_edits(subs: List[Tuple[Optional[int], int, int, str]], edit_path: str) -> SubTimeline:
     """
-    Retorna uma lista de subs efetivos:
-    - Se houver edição para sub.index -> usa segments (vira vários subs virtuais)
+    Recebe as legendas de parse_srt e retorna a timeline de subs efetivos:
+    - Se houver edição para sub.index -> usa segments (vira várias entradas)
     - Senão -> usa sub original
     """
+    starts = array("l")
+    ends = array("l")
+    texts: List[str] = []
+
     edits = _load_srt_edits(edit_path)
     if not edits:
-        return list(subs)
+        for _index, start_ms, end_ms, text in subs:
+            starts.append(start_ms)
+            ends.append(end_ms)
+            texts.append(text)
+        return SubTimeline(starts, ends, texts)
 
     edit_map = {}
     for e in edits:
@@ -167,33 +509,36 @@ def apply_srt_edits(subs: pysrt.SubRipFile, edit_path: str) -> List[Any]:
         except Exception:
             continue
 
-    effective: List[Any] = []
-    for sub in subs:
-        e = edit_map.get(int(sub.index))
-        if not e:
-            effective.append(sub)
-            continue
-
-        segments = e.get("segments") or []
-        if not isinstance(segments, list) or not segments:
-            # se edit veio inválido, cai no original
-            effective.append(sub)
+    for index, start_ms, end_ms, text in subs:
+        e = edit_map.get(index)
+        segments = e.get("segments") or [] if e else None
+        if not segments or not isinstance(segments, list):
+            # sem edit (ou edit inválido): usa o original
+            starts.append(start_ms)
+            ends.append(end_ms)
+            texts.append(text)
             continue
 
-        # cria subs virtuais, mantendo o mesmo index (ok para nosso uso)
+        # um segmento vira uma entrada própria
         for seg in segments:
             try:
-                st = float(seg["start"])
-                en = float(seg["end"])
+                st = int(round(float(seg["start"]) * 1000.0))
+                en = int(round(float(seg["end"]) * 1000.0))
                 tx = str(seg["text"])
-                effective.append(_VirtualSub(int(sub.index), st, en, tx))
             except Exception:
                 # se algum segmento falhar, ignora ele
                 continue
-
-    # ordena por início
-    effective.sort(key=lambda x: x.start.ordinal)
-    return effective
+            starts.append(st)
+            ends.append(en)
+            texts.append(tx)
+
+    # ordena por início (estável, como o sort anterior)
+    order = sorted(range(len(texts)), key=starts.__getitem__)
+    return SubTimeline(
+        array("l", (starts[i] for i in order)),
+        array("l", (ends[i] for i in order)),
+        [texts[i] for i in order],
+    )
 
 # =============================================================================
 # DISCOVERY
@@ -203,12 +548,9 @@ def discover_jobs(root: str) -> List[str]:
     if not os.path.isdir(root):
         raise FileNotFoundError(f"Pasta raiz não encontrada: {root}")
 
-    jobs = []
-    for d in sorted(os.listdir(root)):
-        full = os.path.join(root, d)
-        if os.path.isdir(full) and d.isdigit():
-            jobs.append(d)
-    return jobs
+    with os.scandir(root) as it:
+        jobs = [entry.name for entry in it if entry.name.isdigit() and entry.is_dir()]
+    return sorted(jobs)
 
 def build_job_paths(root: str, job_id: str, use_stickman: bool, output_root: str) -> JobPaths:
     base = os.path.join(root, job_id)
@@ -251,38 +593,93 @@ def build_job_paths(root: str, job_id: str, use_stickman: bool, output_root: str
 
 def load_inputs(paths: JobPaths, use_stickman: bool):
     # SRT original
-    subs_original = pysrt.open(paths.srt, encoding="utf-8")
+    subs_original = parse_srt(paths.srt)
 
     # Se existir srt_edit.json, aplica as edições criando subs "efetivos"
     edit_path = os.path.join(paths.base, SRT_EDIT_FILENAME)
     subs_effective = apply_srt_edits(subs_original, edit_path)
 
-    with open(paths.guide, "r", encoding="utf-8") as f:
-        guide = json.load(f)
+    guide = load_guide(paths.guide)
 
     stickman_guide = None
     if use_stickman:
-        with open(paths.stickman_json, "r", encoding="utf-8") as f:
-            stickman_guide = json.load(f)
+        with open(paths.stickman_json, "rb") as f:
+            stickman_guide = loads_json(f.read())
 
     return subs_effective, guide, stickman_guide
 
-def find_stickman_for_trigger(trigger: str, stickman_guide, subs) -> Dict[str, str]:
+def _warm_ffmpeg():
+    """Roda um ffmpeg trivial só para carregar binário/DLLs no cache do SO."""
+    try:
+        subprocess.run(["ffmpeg", "-hide_banner", "-version"], capture_output=True)
+    except OSError:
+        pass
+
+def _prefetch_inputs(paths_future: Future, use_stickman: bool):
+    return load_inputs(paths_future.result(), use_stickman=use_stickman)
+
+def audio_meta_path(paths: JobPaths) -> str:
+    return os.path.join(paths.output_root, paths.job_id, AUDIO_META_FILENAME)
+
+def prepare_job(root: str, job_id: str, use_stickman: bool, output_root: str) -> JobPaths:
+    """
+    build_job_paths + leitura antecipada da duração do áudio (aquece os caches
+    em memória e em disco). Roda em paralelo para todos os jobs no main().
+    """
+    paths = build_job_paths(root, job_id, use_stickman=use_stickman, output_root=output_root)
+    try:
+        get_audio_duration(paths.audio, audio_meta_path(paths))
+    except Exception:
+        # o erro de verdade aparece quando o job for processado
+        pass
+    return paths
+
+def normalize_stickman_guide(stickman_guide) -> List[Tuple[str, Dict[str, Any]]]:
+    """(trigger normalizado, item) de cada entrada do stickman.json."""
+    return [(norm(item.get("trigger", "")), item) for item in stickman_guide]
+
+def find_stickman_for_trigger(
+    trigger: str,
+    norm_stickman: List[Tuple[str, Dict[str, Any]]],
+    index: SubIndex,
+) -> Dict[str, str]:
     default_path = find_stickman_by_name(STICKMAN_DEFAULT)
     if not default_path:
         return {"path": "", "speech": ""}
 
-    # Agora "subs" pode ser lista de SubRipItem OU VirtualSub (ambos têm .text)
-    for sub in subs:
-        if trigger_in_text(trigger, sub.text):
-            for item in stickman_guide:
-                if norm(item.get("trigger", "")) in norm(sub.text):
-                    expr = item.get("expression", STICKMAN_DEFAULT)
-                    p = find_stickman_by_name(expr) or default_path
-                    return {"path": p, "speech": item.get("speech", "")}
+    for i in sub_matches(index, trigger):
+        text = index.norm_texts[i]
+        for t_norm, item in norm_stickman:
+            if t_norm in text:
+                expr = item.get("expression", STICKMAN_DEFAULT)
+                p = find_stickman_by_name(expr) or default_path
+                return {"path": p, "speech": item.get("speech", "")}
 
     return {"path": default_path, "speech": ""}
 
+def parse_guide_item(item: Dict[str, Any]) -> GuideItem:
+    """Lê os campos do item uma única vez (defaults e normalizações inclusos)."""
+    image_ids = item.get("image_ids")
+    if isinstance(image_ids, list) and image_ids:
+        ids = tuple(str(i).strip() for i in image_ids if str(i).strip())
+    else:
+        image_id = str(item.get("image_id", "")).strip()
+        ids = (image_id,) if image_id else ()
+
+    effects = item.get("effects", {})
+    return GuideItem(
+        trigger=item["trigger"],
+        mode=(item.get("mode", "image-only") or "image-only").lower().replace("_", "-"),
+        layout=item.get("layout", "legacy_single"),
+        image_ids=ids,
+        effects=effects if isinstance(effects, dict) else {},
+        text=item.get("text"),
+        text_anchor=item.get("text_anchor"),
+        text_margin=item.get("text_margin"),
+        stickman_anim=item.get("stickman_anim"),
+        stickman_position=item.get("stickman_position"),
+    )
+
 def build_timeline(
     subs,
     guide,
@@ -290,33 +687,24 @@ def build_timeline(
     audio_path: str,
     images_dir: str,
     use_stickman: bool,
-    disable_zoom: bool = False
+    disable_zoom: bool = False,
+    audio_meta_path: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     timeline = []
-
-    def _normalize_mode(mode_value: str) -> str:
-        mode_value = (mode_value or "image-only").lower().replace("_", "-")
-        return mode_value
+    guide = [parse_guide_item(item) for item in guide]
 
     def _normalize_layout(layout_value: str) -> str:
         return (layout_value or "legacy_single").strip().lower()
 
-    def _get_item_image_ids(item: Dict[str, Any]) -> List[str]:
-        image_ids = item.get("image_ids")
-        if isinstance(image_ids, list) and image_ids:
-            return [str(i).strip() for i in image_ids if str(i).strip()]
-        image_id = str(item.get("image_id", "")).strip()
-        return [image_id] if image_id else []
-
-    def _collect_item_images(item: Dict[str, Any], mode: str) -> List[Dict[str, Any]]:
-        if mode not in ["image-only", "image-with-text"]:
+    def _collect_item_images(item: GuideItem) -> List[Dict[str, Any]]:
+        if item.mode not in ["image-only", "image-with-text"]:
             return []
 
-        image_ids = _get_item_image_ids(item)
+        image_ids = item.image_ids
         if not image_ids:
             return []
 
-        effects = item.get("effects", {}) if isinstance(item.get("effects"), dict) else {}
+        effects = item.effects
         zoom_enabled = False if disable_zoom else effects.get("zoom", False)
         slide_direction = effects.get("slide")
 
@@ -334,108 +722,93 @@ def build_timeline(
 
         return images
 
-    def _build_parent_links():
-        parent_links: Dict[int, List[int]] = {}
-        i = 0
-        while i < len(guide):
-            item = guide[i]
-            mode = _normalize_mode(item.get("mode", "image-only"))
-            layout_norm = _normalize_layout(item.get("layout", "legacy_single"))
-            if mode in ["image-only", "image-with-text"] and layout_norm in {
-                "two_images_center",
-                "stickman_left_3img",
-            }:
-                required = 2 if layout_norm == "two_images_center" else 3
-                image_count = len(_get_item_image_ids(item))
-                needed = max(required - image_count, 0)
-                children: List[int] = []
-                for offset in range(1, needed + 1):
-                    child_index = i + offset
-                    if child_index >= len(guide):
-                        break
-                    child_item = guide[child_index]
-                    child_layout_norm = _normalize_layout(child_item.get("layout", "legacy_single"))
-                    if child_layout_norm not in {"legacy_single", "image_center_only"}:
-                        print_safe(
-                            "[WARN] Layout complexo não permitido como filho "
-                            f"em '{child_item.get('trigger', '')}'. "
-                            "Use legacy_single ou image_center_only."
-                        )
-                        break
-                    children.append(child_index)
-                if children:
-                    parent_links[i] = children
-                i += 1 + len(children)
-                continue
-            i += 1
-        return parent_links
+    def _static(images: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{**image, "zoom_enabled": False, "slide_direction": None} for image in images]
 
-    parent_links = _build_parent_links()
+    item_images: Dict[int, List[Dict[str, Any]]] = {}
+
+    def _images_of(i: int) -> List[Dict[str, Any]]:
+        # coleta (e avisa sobre IDs ausentes) uma única vez por item
+        if i not in item_images:
+            item_images[i] = _collect_item_images(guide[i])
+        return item_images[i]
+
+    # Uma única passada: acha os pais com layout múltiplo e já expande o
+    # estado dos filhos (imagens combinadas, layout herdado, slot do texto).
     child_layout_overrides: Dict[int, str] = {}
     child_effective_images: Dict[int, List[Dict[str, Any]]] = {}
     child_has_images: Dict[int, bool] = {}
     child_text_anchor_slot: Dict[int, Optional[int]] = {}
-    for parent_index, children in parent_links.items():
-        parent_item = guide[parent_index]
-        parent_mode = _normalize_mode(parent_item.get("mode", "image-only"))
-        parent_layout = parent_item.get("layout", "legacy_single")
-        parent_base_images = _collect_item_images(parent_item, parent_mode)
+    i = 0
+    while i < len(guide):
+        item = guide[i]
+        parent_layout = item.layout
         layout_norm = _normalize_layout(parent_layout)
+        if item.mode not in ["image-only", "image-with-text"] or layout_norm not in {
+            "two_images_center",
+            "stickman_left_3img",
+        }:
+            i += 1
+            continue
+
         required = 2 if layout_norm == "two_images_center" else 3
-        cumulative_children: List[Dict[str, Any]] = []
-        for child_index in children:
+        image_count = len(item.image_ids)
+        needed = max(required - image_count, 0)
+        children: List[int] = []
+        for offset in range(1, needed + 1):
+            child_index = i + offset
+            if child_index >= len(guide):
+                break
             child_item = guide[child_index]
-            child_mode = _normalize_mode(child_item.get("mode", "image-only"))
-            child_images = _collect_item_images(child_item, child_mode)
-            child_has_images[child_index] = bool(child_images)
-            child_slot_start = len(parent_base_images) + len(cumulative_children)
-            static_base = [
-                {
-                    **image,
-                    "zoom_enabled": False,
-                    "slide_direction": None,
-                }
-                for image in parent_base_images
-            ]
-            static_previous = [
-                {
-                    **image,
-                    "zoom_enabled": False,
-                    "slide_direction": None,
-                }
-                for image in cumulative_children
-            ]
-            combined = static_base + static_previous + child_images
-            child_effective_images[child_index] = combined[:required]
-            child_layout_overrides[child_index] = parent_layout
-            if child_images:
-                child_text_anchor_slot[child_index] = min(child_slot_start, required - 1)
-            else:
-                child_text_anchor_slot[child_index] = None
-            cumulative_children.extend(child_images)
+            child_layout_norm = _normalize_layout(child_item.layout)
+            if child_layout_norm not in {"legacy_single", "image_center_only"}:
+                print_safe(
+                    "[WARN] Layout complexo não permitido como filho "
+                    f"em '{child_item.trigger}'. "
+                    "Use legacy_single ou image_center_only."
+                )
+                break
+            children.append(child_index)
+
+        if children:
+            parent_base_images = _images_of(i)
+            static_base = _static(parent_base_images)
+            static_previous: List[Dict[str, Any]] = []
+            for child_index in children:
+                child_images = _images_of(child_index)
+                child_has_images[child_index] = bool(child_images)
+                child_slot_start = len(parent_base_images) + len(static_previous)
+                combined = static_base + static_previous + child_images
+                child_effective_images[child_index] = combined[:required]
+                child_layout_overrides[child_index] = parent_layout
+                if child_images:
+                    child_text_anchor_slot[child_index] = min(child_slot_start, required - 1)
+                else:
+                    child_text_anchor_slot[child_index] = None
+                static_previous.extend(_static(child_images))
+        i += 1 + len(children)
+
+    sub_index = build_sub_index(subs.texts)
+    norm_stickman = normalize_stickman_guide(stickman_guide) if use_stickman else []
+    first_sub = first_trigger_matches([norm(item.trigger) for item in guide], sub_index)
 
     for idx, item in enumerate(guide):
-        trigger = norm(item["trigger"])
+        trigger = norm(item.trigger)
 
-        mode = _normalize_mode(item.get("mode", "image-only"))
-        layout_name = item.get("layout", "legacy_single")
+        mode = item.mode
+        layout_name = item.layout
         if idx in child_layout_overrides:
             layout_name = child_layout_overrides[idx]
-        layout_norm = _normalize_layout(layout_name)
 
-        matched_sub = None
-        for sub in subs:
-            if trigger_in_text(trigger, sub.text):
-                matched_sub = sub
-                break
-
-        if not matched_sub:
+        matched_sub = first_sub.get(trigger)
+        if matched_sub is None:
             print_safe(f"[WARN] Trigger '{trigger}' não encontrado no SRT efetivo")
             continue
 
-        images: List[Dict[str, Any]] = _collect_item_images(item, mode)
         if idx in child_effective_images:
             images = child_effective_images[idx]
+        else:
+            images = _images_of(idx)
 
         if mode in ["image-only", "image-with-text"] and not images:
             print_safe(f"[WARN] Mode '{mode}' requer imagem, mas não há image_id(s)")
@@ -443,35 +816,35 @@ def build_timeline(
         if idx in child_layout_overrides and mode in ["image-only", "image-with-text"]:
             if not child_has_images.get(idx, True):
                 print_safe(
-                    f"[WARN] Item filho '{item.get('trigger', '')}' "
+                    f"[WARN] Item filho '{item.trigger}' "
                     "não possui imagem para compor layout múltiplo."
                 )
 
         stickman_cfg = None
         if use_stickman:
-            stickman_cfg = find_stickman_for_trigger(trigger, stickman_guide, subs)
+            stickman_cfg = find_stickman_for_trigger(trigger, norm_stickman, sub_index)
 
-        text_anchor = item.get("text_anchor")
-        if mode == "image-with-text" and item.get("text") and not text_anchor:
+        text_anchor = item.text_anchor
+        if mode == "image-with-text" and item.text and not text_anchor:
             text_anchor = "bottom"
 
         timeline.append({
             "trigger": trigger,
             "images": images,
-            "start": matched_sub.start.ordinal / 1000.0,
-            "text": item.get("text"),
+            "start": subs.starts_ms[matched_sub] / 1000.0,
+            "text": item.text,
             "text_anchor": text_anchor,
-            "text_margin": item.get("text_margin"),
+            "text_margin": item.text_margin,
             "text_anchor_slot": child_text_anchor_slot.get(idx),
             "mode": mode,
             "stickman_cfg": stickman_cfg,
             "layout": layout_name,
-            "stickman_anim": item.get("stickman_anim"),
-            "stickman_position": item.get("stickman_position"),
+            "stickman_anim": item.stickman_anim,
+            "stickman_position": item.stickman_position,
         })
 
     timeline.sort(key=lambda x: x["start"])
-    audio_duration = get_audio_duration(audio_path)
+    audio_duration = get_audio_duration(audio_path, audio_meta_path)
 
     for i in range(len(timeline)):
         if i < len(timeline) - 1:
@@ -486,18 +859,32 @@ def concat_job_clips(paths: JobPaths, clip_paths: List[str], output_video_path:
     """
     Concatena os clips do job e adiciona o áudio do próprio job.
     Usa concat demuxer com cwd=paths.output_dir (onde ficam os clips e o concat.txt).
+
+    O vídeo é copiado sem reencode (-c:v copy); isso depende de render_clip
+    gerar todos os clips com os mesmos parâmetros (libx264 high@4.0, yuv420p,
+    mesmo FPS/GOP e timescale 90000). Não altere um lado sem o outro.
     """
     os.makedirs(os.path.dirname(output_video_path), exist_ok=True)
 
     concat_file = os.path.join(paths.output_dir, "concat.txt")
 
-    with open(concat_file, "w", encoding="utf-8") as f:
-        for cp in clip_paths:
-            f.write(f"file '{os.path.basename(cp)}'\n")
+    # aspas simples no nome precisam virar '\'' no formato do concat demuxer
+    lines = [
+        "file '{}'".format(os.path.basename(cp).replace("'", "'\\''"))
+        for cp in clip_paths
+    ]
+    with open(concat_file, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write("\n".join(lines) + "\n")
 
     audio_abs = os.path.abspath(paths.audio)
     out_abs = os.path.abspath(output_video_path)
 
+    # áudio já em AAC entra direto no mp4; os demais são reencodados
+    if get_audio_codec(audio_abs) == "aac":
+        audio_codec = ["-c:a", "copy"]
+    else:
+        audio_codec = ["-c:a", "aac", "-b:a", "192k"]
+
     subprocess.run([
         "ffmpeg", "-y",
         "-f", "concat",
@@ -505,8 +892,8 @@ def concat_job_clips(paths: JobPaths, clip_paths: List[str], output_video_path:
         "-i", "concat.txt",
         "-i", audio_abs,
         "-c:v", "copy",
-        "-c:a", "aac",
-        "-b:a", "192k",
+        *audio_codec,
+        "-movflags", "+faststart",
         out_abs
     ], check=True, cwd=paths.output_dir)
 
@@ -514,7 +901,17 @@ def concat_job_clips(paths: JobPaths, clip_paths: List[str], output_video_path:
 # PROCESS
 # =============================================================================
 
-def process_job(paths: JobPaths, use_stickman: bool, disable_zoom: bool, stickman_side: str):
+def process_job(
+    paths: JobPaths,
+    use_stickman: bool,
+    disable_zoom: bool,
+    stickman_side: str,
+    workers: int = 1,
+    ffmpeg_threads: Optional[int] = None,
+    inputs: Optional[Future] = None,
+    encoder: str = "cpu",
+    clip_cache: bool = False,
+):
     print_safe(f"\n>> Processando job {paths.job_id}")
     print_safe(f"   Root:  {paths.base}")
     print_safe(f"   Audio: {paths.audio}")
@@ -522,7 +919,11 @@ def process_job(paths: JobPaths, use_stickman: bool, disable_zoom: bool, stickma
     print_safe(f"   SRT_EDIT: {os.path.join(paths.base, SRT_EDIT_FILENAME)} (se existir)")
     print_safe(f"   Mode:  {'stickman' if use_stickman else 'somente-imagens'}")
 
-    subs, guide, stickman_guide = load_inputs(paths, use_stickman=use_stickman)
+    if inputs is not None:
+        # já carregados em segundo plano (--prefetch)
+        subs, guide, stickman_guide = inputs.result()
+    else:
+        subs, guide, stickman_guide = load_inputs(paths, use_stickman=use_stickman)
 
     timeline = build_timeline(
         subs,
@@ -531,88 +932,198 @@ def process_job(paths: JobPaths, use_stickman: bool, disable_zoom: bool, stickma
         paths.audio,
         paths.images_dir,
         use_stickman=use_stickman,
-        disable_zoom=disable_zoom
+        disable_zoom=disable_zoom,
+        audio_meta_path=audio_meta_path(paths),
     )
 
     if not timeline:
         print_safe("[WARN] Timeline vazia. Pulando job.")
         return
 
-    rendered: List[str] = []
     total = len(timeline)
+    workers = max(1, min(workers, total))
+    if workers > 1 and not ffmpeg_threads:
+        # divide os núcleos entre os ffmpeg que rodam ao mesmo tempo
+        ffmpeg_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    # Cada clip é independente (arquivo próprio); o trabalho pesado fica no
+    # processo do ffmpeg, então threads bastam para renderizar em paralelo.
+    # Cada spec é enviado assim que fica pronto: os primeiros clips já
+    # renderizam enquanto os seguintes ainda estão sendo montados.
+    # Clips idênticos (mesmo spec e mesmos arquivos) são renderizados uma vez
+    # só: no job, o concat repete o arquivo; entre execuções, vem do cache
+    # em disco (opcional, --clip-cache).
+    cache_dir = os.path.join(paths.output_root, CLIP_CACHE_DIRNAME) if clip_cache else None
+    rendered: List[Optional[str]] = [None] * total
+    first_by_key: Dict[str, int] = {}
+    same_as: Dict[int, int] = {}
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = []
+        try:
+            for idx, item in enumerate(timeline):
+                out_clip = os.path.join(paths.output_dir, f"clip_{idx:03d}.mp4")
+                clip_spec = _build_clip_spec(item, use_stickman, stickman_side, out_clip)
+                clip_spec.ffmpeg_threads = ffmpeg_threads
+                clip_spec.encoder = encoder
+                key = clip_cache_key(clip_spec)
+                if key is not None:
+                    if key in first_by_key:
+                        same_as[idx] = first_by_key[key]
+                        continue
+                    first_by_key[key] = idx
+                futures.append(ex.submit(_render_one, idx, clip_spec, out_clip, cache_dir, key))
+
+            to_render = len(futures)
+            for done, fut in enumerate(as_completed(futures), start=1):
+                idx, out_clip, warnings = fut.result()
+                for warning in warnings:
+                    print_safe(f"[WARN] {warning}")
+                # a linha de progresso faz o flush dos avisos acima
+                pct = int((done / to_render) * 100)
+                print_safe(f"[{done}/{to_render} | {pct}%] Renderizando clip")
+                rendered[idx] = out_clip
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            raise
+
+    for idx, first in same_as.items():
+        rendered[idx] = rendered[first]
+    if same_as:
+        print_safe(f"[INFO] {len(same_as)} clip(s) repetido(s) reaproveitado(s)")
+
+    final_video = os.path.join(paths.output_root, paths.job_id, f"video_final_{paths.job_id}.mp4")
+    print_safe(f"[{total}/{total} | 100%] Concatenando clips + audio")
+    concat_job_clips(paths, rendered, final_video)
 
-    for idx, item in enumerate(timeline, start=1):
-        pct = int((idx / total) * 100)
-        print_safe(f"[{idx}/{total} | {pct}%] Renderizando clip")
+    print_safe(f"OK: Job {paths.job_id} finalizado -> {final_video}")
+    sys.stdout.flush()
+
+def _build_clip_spec(item: Dict[str, Any], use_stickman: bool, stickman_side: str, out_clip: str) -> ClipSpec:
+    images = [
+        ImageLayer(
+            path=image["path"],
+            zoom_enabled=image.get("zoom_enabled", False),
+            slide_direction=image.get("slide_direction"),
+        )
+        for image in item["images"]
+    ]
 
-        out_clip = os.path.join(paths.output_dir, f"clip_{idx-1:03d}.mp4")
+    stickman_layer = None
+    stickman_position = item.get("stickman_position") or stickman_side
+    layout_result, layout_warnings = resolve_layout(
+        item["layout"],
+        use_stickman=use_stickman,
+        image_count=len(item["images"]),
+        stickman_side=stickman_position,
+    )
+    for warning in layout_warnings:
+        print_safe(f"[WARN] {warning}")
 
-        images = [
-            ImageLayer(
-                path=image["path"],
-                zoom_enabled=image.get("zoom_enabled", False),
-                slide_direction=image.get("slide_direction"),
-            )
-            for image in item["images"]
-        ]
-
-        stickman_layer = None
-        stickman_position = item.get("stickman_position") or stickman_side
-        layout_result, layout_warnings = resolve_layout(
-            item["layout"],
-            use_stickman=use_stickman,
-            image_count=len(item["images"]),
-            stickman_side=stickman_position,
-        )
-        for warning in layout_warnings:
-            print_safe(f"[WARN] {warning}")
+    if use_stickman:
+        if layout_result.stickman_pos is None:
+            stickman_layer = None
+        else:
+            if not item["stickman_cfg"] or not item["stickman_cfg"].get("path"):
+                raise RuntimeError(f"Stickman não encontrado para clip {out_clip}")
 
-        if use_stickman:
-            if layout_result.stickman_pos is None:
-                stickman_layer = None
-            else:
-                if not item["stickman_cfg"] or not item["stickman_cfg"].get("path"):
-                    raise RuntimeError(f"Stickman não encontrado para clip {out_clip}")
-
-                anim_cfg = item.get("stickman_anim")
-                anim = None
-                if isinstance(anim_cfg, dict) and anim_cfg.get("name"):
-                    anim = StickmanAnim(
-                        name=str(anim_cfg.get("name")),
-                        direction=anim_cfg.get("direction"),
-                    )
-
-                stickman_layer = StickmanLayer(
-                    path=item["stickman_cfg"]["path"],
-                    speech=item["stickman_cfg"].get("speech", ""),
-                    anim=anim,
+            anim_cfg = item.get("stickman_anim")
+            anim = None
+            if isinstance(anim_cfg, dict) and anim_cfg.get("name"):
+                anim = StickmanAnim(
+                    name=str(anim_cfg.get("name")),
+                    direction=anim_cfg.get("direction"),
                 )
 
-        clip_spec = ClipSpec(
-            duration=item["duration"],
-            fps=FPS,
-            width=OUT_W,
-            height=OUT_H,
-            layout=item["layout"],
-            stickman_position=stickman_position,
-            images=images,
-            stickman=stickman_layer,
-            text=item["text"],
-            text_anchor=item.get("text_anchor"),
-            text_margin=item.get("text_margin"),
-            text_anchor_slot=item.get("text_anchor_slot"),
-        )
+            stickman_layer = StickmanLayer(
+                path=presized_stickman(item["stickman_cfg"]["path"]),
+                speech=item["stickman_cfg"].get("speech", ""),
+                anim=anim,
+            )
 
-        warnings = render_clip(clip_spec, out_clip)
-        for warning in warnings:
-            print_safe(f"[WARN] {warning}")
-        rendered.append(out_clip)
-
-    final_video = os.path.join(paths.output_root, paths.job_id, f"video_final_{paths.job_id}.mp4")
-    print_safe(f"[{total}/{total} | 100%] Concatenando clips + audio")
-    concat_job_clips(paths, rendered, final_video)
+    return ClipSpec(
+        duration=item["duration"],
+        fps=FPS,
+        width=OUT_W,
+        height=OUT_H,
+        layout=item["layout"],
+        stickman_position=stickman_position,
+        images=images,
+        stickman=stickman_layer,
+        text=item["text"],
+        text_anchor=item.get("text_anchor"),
+        text_margin=item.get("text_margin"),
+        text_anchor_slot=item.get("text_anchor_slot"),
+    )
+
+# Módulos cujo código/constantes definem o MP4 gerado: mudou algum, o cache
+# de clips deixa de valer.
+_RENDER_MODULES = ("clip_specs", "config", "layouts", "renderer_v2", "stickman_animations")
+
+@lru_cache(maxsize=1)
+def _render_code_stamp() -> Tuple[Tuple[str, int, int], ...]:
+    stamps = []
+    for name in _RENDER_MODULES:
+        st = os.stat(sys.modules[name].__file__)
+        stamps.append((name, st.st_size, st.st_mtime_ns))
+    return tuple(stamps)
+
+def clip_cache_key(clip_spec: ClipSpec) -> Optional[str]:
+    """Hash do spec + arquivos de entrada (None se algum arquivo sumiu)."""
+    spec = asdict(clip_spec)
+    spec.pop("ffmpeg_threads")  # só afeta o tempo do render
+    files = [image.path for image in clip_spec.images]
+    if clip_spec.stickman:
+        files.append(clip_spec.stickman.path)
+    stamps = []
+    for p in files:
+        try:
+            st = os.stat(p)
+        except OSError:
+            return None
+        stamps.append((p, st.st_size, st.st_mtime_ns))
+    # fonte do drawtext: trocar o arquivo muda o clip mesmo com o spec igual
+    try:
+        st = os.stat(FONTFILE)
+        stamps.append((FONTFILE, st.st_size, st.st_mtime_ns))
+    except OSError:
+        stamps.append((FONTFILE, None, None))
+    payload = json.dumps([spec, stamps, _render_code_stamp()], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def _render_one(
+    idx: int,
+    clip_spec: ClipSpec,
+    out_clip: str,
+    cache_dir: Optional[str] = None,
+    key: Optional[str] = None,
+) -> Tuple[int, str, List[str]]:
+    if not cache_dir or not key:
+        return idx, out_clip, render_clip(clip_spec, out_clip)
+
+    cached = os.path.join(cache_dir, f"{key}.mp4")
+    cached_meta = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(cached_meta, "rb") as f:
+            warnings = loads_json(f.read())
+        # cópia (não hardlink): o próximo render do clip sobrescreve out_clip
+        shutil.copyfile(cached, out_clip)
+        return idx, out_clip, warnings
+    except (OSError, ValueError):
+        pass
 
-    print_safe(f"OK: Job {paths.job_id} finalizado -> {final_video}")
+    warnings = render_clip(clip_spec, out_clip)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.{idx}.tmp"
+        shutil.copyfile(out_clip, tmp)
+        os.replace(tmp, cached)
+        # os avisos vão por último: sem o .json o clip não conta como cacheado
+        with open(cached_meta, "w", encoding="utf-8") as f:
+            json.dump(warnings, f, ensure_ascii=False)
+    except OSError as e:
+        print_safe(f"[WARN] Falha ao gravar clip no cache ({e})")
+    return idx, out_clip, warnings
 
 # =============================================================================
 # MAIN
@@ -635,6 +1146,17 @@ def main():
                         help="Desabilita o zoom de todas as triggers (útil para testes).")
     parser.add_argument("--convert-png-to-jpg", action="store_true",
                         help="Converte PNGs das pastas batches para JPG antes do render.")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 2) - 1, 2),
+                        help="Clips renderizados em paralelo por job (1 = sequencial).")
+    parser.add_argument("--ffmpeg-threads", type=int, default=0,
+                        help="Threads de cada ffmpeg (0 = núcleos / workers).")
+    parser.add_argument("--encoder", choices=["auto", *ENCODERS], default="auto",
+                        help="Encoder H.264 dos clips (auto = GPU se disponível, senão cpu).")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Carrega SRT/guia do próximo job enquanto o atual renderiza.")
+    parser.add_argument("--clip-cache", action="store_true",
+                        help=f"Reaproveita clips já renderizados entre execuções (<output>/{CLIP_CACHE_DIRNAME}; "
+                             "cresce sem limite, apague a pasta para liberar espaço).")
     args = parser.parse_args()
 
     use_stickman = (not args.no_stickman)
@@ -658,19 +1180,40 @@ def main():
 
     os.makedirs(args.output, exist_ok=True)
 
+    encoder = resolve_encoder(args.encoder)
+    print_safe(f"[INFO] Encoder de vídeo: {encoder}")
+
     if args.convert_png_to_jpg:
         print_safe("[INFO] Convertendo PNGs para JPG antes do render...")
         for job_id in jobs:
             convert_pngs_in_batches(args.root, job_id)
 
-    for job_id in jobs:
-        paths = build_job_paths(args.root, job_id, use_stickman=use_stickman, output_root=args.output)
-        process_job(
-            paths,
-            use_stickman=use_stickman,
-            disable_zoom=args.disable_zoom,
-            stickman_side=stickman_side,
-        )
+    # Descoberta de arquivos e probe do áudio dos jobs em paralelo (I/O e
+    # subprocessos); os erros de cada job continuam surgindo na ordem, só
+    # quando o job seria processado.
+    with ThreadPoolExecutor(max_workers=min(16, len(jobs) + 1)) as ex:
+        ex.submit(_warm_ffmpeg)
+        pending_paths = [
+            ex.submit(prepare_job, args.root, job_id, use_stickman=use_stickman, output_root=args.output)
+            for job_id in jobs
+        ]
+        next_inputs = None
+        for i, fut in enumerate(pending_paths):
+            paths = fut.result()
+            inputs, next_inputs = next_inputs, None
+            if args.prefetch and i + 1 < len(pending_paths):
+                next_inputs = ex.submit(_prefetch_inputs, pending_paths[i + 1], use_stickman)
+            process_job(
+                paths,
+                use_stickman=use_stickman,
+                disable_zoom=args.disable_zoom,
+                stickman_side=stickman_side,
+                workers=args.workers,
+                ffmpeg_threads=args.ffmpeg_threads or None,
+                inputs=inputs,
+                encoder=encoder,
+                clip_cache=args.clip_cache,
+            )
 
 if __name__ == "__main__":
     main()
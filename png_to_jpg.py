@@ -1,6 +1,7 @@
 import argparse
 import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Iterable, Tuple
 
 from PIL import Image, UnidentifiedImageError
@@ -15,43 +16,55 @@ def _iter_batches(root: str, job: Optional[str] = None) -> Iterable[Tuple[str, s
             yield job, batch_dir
         return
 
-    for entry in sorted(os.listdir(root)):
-        batch_dir = os.path.join(root, entry)
-        if entry.isdigit() and os.path.isdir(batch_dir):
-            yield entry, batch_dir
+    # scandir já traz o tipo de cada entrada (sem um stat por pasta)
+    with os.scandir(root) as it:
+        batches = sorted((e.name, e.path) for e in it if e.name.isdigit() and e.is_dir())
+    yield from batches
 
 
-def convert_pngs_in_batches(root: str, job: Optional[str] = None) -> int:
-    converted = 0
+def _convert_one(png_path: str) -> Optional[Exception]:
+    """Converte um PNG para JPG (mesmo nome) e remove o PNG; devolve o erro, se houver."""
+    jpg_path = os.path.splitext(png_path)[0] + ".jpg"
+    try:
+        with Image.open(png_path) as img:
+            # PNG já RGB vai direto para o encoder (convert() faria uma cópia)
+            rgb = img if img.mode == "RGB" else img.convert("RGB")
+            rgb.save(jpg_path, "JPEG", quality=95)
+    except (UnidentifiedImageError, OSError) as exc:
+        return exc
+    os.remove(png_path)
+    return None
 
-    for job_id, batch_dir in _iter_batches(root, job):
-        images_dir = os.path.join(batch_dir, "imagens")
-        if not os.path.isdir(images_dir):
-            continue
 
-        batch_converted = 0
-        for filename in os.listdir(images_dir):
-            if not filename.lower().endswith(".png"):
-                continue
+def convert_pngs_in_batches(root: str, job: Optional[str] = None, workers: Optional[int] = None) -> int:
+    converted = 0
 
-            png_path = os.path.join(images_dir, filename)
-            jpg_path = os.path.join(images_dir, os.path.splitext(filename)[0] + ".jpg")
+    # O PIL libera o GIL ao decodificar/codificar, então threads bastam para
+    # converter vários arquivos ao mesmo tempo. O filtro de avisos é global
+    # (catch_warnings não é thread-safe), por isso fica em volta do pool.
+    with warnings.catch_warnings(), ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        warnings.simplefilter("ignore", UserWarning)
 
-            try:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", UserWarning)
-                    with Image.open(png_path) as img:
-                        img.convert("RGB").save(jpg_path, "JPEG", quality=95)
-            except (UnidentifiedImageError, OSError) as exc:
-                print(f"[WARN] Batch {job_id}: falha ao converter {filename}: {exc}")
+        for job_id, batch_dir in _iter_batches(root, job):
+            images_dir = os.path.join(batch_dir, "imagens")
+            if not os.path.isdir(images_dir):
                 continue
 
-            os.remove(png_path)
-            converted += 1
-            batch_converted += 1
-
-        if batch_converted:
-            print(f"[INFO] Batch {job_id}: {batch_converted} PNG(s) convertidos para JPG.")
+            with os.scandir(images_dir) as it:
+                pngs = [(e.name, e.path) for e in it if e.name.lower().endswith(".png") and e.is_file()]
+            filenames = [name for name, _ in pngs]
+            png_paths = [path for _, path in pngs]
+
+            batch_converted = 0
+            for filename, exc in zip(filenames, pool.map(_convert_one, png_paths)):
+                if exc is not None:
+                    print(f"[WARN] Batch {job_id}: falha ao converter {filename}: {exc}")
+                    continue
+                converted += 1
+                batch_converted += 1
+
+            if batch_converted:
+                print(f"[INFO] Batch {job_id}: {batch_converted} PNG(s) convertidos para JPG.")
 
     return converted
 
@@ -1,7 +1,18 @@
 import math
+import os
 import re
 import subprocess
-from typing import List
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List
+
+# Pillow (opcional) lê as dimensões da imagem só pelo cabeçalho, sem ffprobe
+try:
+    from PIL import Image  # type: ignore
+    PIL_OK = True
+except Exception:
+    Image = None
+    PIL_OK = False
 
 from clip_specs import ClipSpec, ImageLayer, StickmanLayer
 from config import (
@@ -25,10 +36,130 @@ from layouts import resolve_layout
 from stickman_animations import build_stickman_animation
 
 
+# Encoders H.264 suportados. Todos usam o mesmo GOP/perfil para que o concat
+# final continue fazendo stream-copy (ver concat_job_clips).
+ENCODERS = {
+    "cpu": "libx264",
+    "nvenc": "h264_nvenc",
+    "qsv": "h264_qsv",
+    "amf": "h264_amf",
+}
+HW_ENCODER_ORDER = ("nvenc", "qsv", "amf")
+
+
+def _encoder_args(encoder: str, fps: int) -> List[str]:
+    if encoder == "nvenc":
+        args = ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "hq",
+                "-rc", "vbr", "-cq", "23", "-b:v", "0"]
+    elif encoder == "qsv":
+        args = ["-c:v", "h264_qsv", "-preset", "veryfast", "-global_quality", "23"]
+    elif encoder == "amf":
+        args = ["-c:v", "h264_amf", "-quality", "speed",
+                "-rc", "cqp", "-qp_i", "23", "-qp_p", "23"]
+    else:
+        return ["-c:v", "libx264", "-preset", "fast", "-crf", "23",
+                "-profile:v", "high", "-level", "4.0",
+                "-x264-params", f"keyint={fps * 2}:min-keyint={fps}:scenecut=0"]
+    return args + ["-profile:v", "high", "-g", str(fps * 2)]
+
+
+@lru_cache(maxsize=None)
+def _encoder_works(encoder: str) -> bool:
+    """Encoder listado pelo ffmpeg E capaz de abrir o dispositivo (teste curto)."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-v", "error",
+        "-f", "lavfi", "-i", "color=c=black:s=256x256:r=25:d=0.2",
+        "-c:v", ENCODERS[encoder], "-f", "null", "-",
+    ]
+    try:
+        return subprocess.run(cmd, capture_output=True).returncode == 0
+    except OSError:
+        return False
+
+
+def resolve_encoder(choice: str) -> str:
+    """
+    "auto" -> primeiro encoder de hardware que funciona nesta máquina (ou "cpu").
+    Um encoder explícito que não funciona também cai para "cpu".
+    """
+    if choice == "cpu":
+        return "cpu"
+    candidates = HW_ENCODER_ORDER if choice == "auto" else (choice,)
+    for encoder in candidates:
+        if encoder in ENCODERS and _encoder_works(encoder):
+            return encoder
+    return "cpu"
+
+
+# Linhas finais do stderr guardadas para a mensagem de erro do render
+FFMPEG_STDERR_TAIL = 200
+
+
+def _run_ffmpeg(cmd: List[str]) -> tuple[int, str]:
+    """
+    Roda o ffmpeg lendo o stderr linha a linha e guardando só o final
+    (memória constante mesmo em encodes longos). Devolve (returncode, stderr).
+    """
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
+    tail: deque = deque(maxlen=FFMPEG_STDERR_TAIL)
+    with proc:
+        for line in proc.stderr:
+            tail.append(line)
+    return proc.returncode, "".join(tail)
+
+
 def _is_gif(path: str) -> bool:
     return path.lower().endswith(".gif")
 
 
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@lru_cache(maxsize=1024)
+def _has_alpha(path: str) -> bool:
+    """
+    False só quando a imagem com certeza é opaca (JPEG, PNG sem canal alfa
+    nem tRNS). Na dúvida (GIF, formato desconhecido, erro de leitura) True.
+    """
+    lower = path.lower()
+    if lower.endswith((".jpg", ".jpeg")):
+        return False
+    if not lower.endswith(".png"):
+        return True
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != _PNG_SIGNATURE:
+                return True
+            while True:
+                head = f.read(8)
+                if len(head) < 8:
+                    return True
+                length = int.from_bytes(head[:4], "big")
+                kind = head[4:]
+                if kind == b"IHDR":
+                    ihdr = f.read(length)
+                    if len(ihdr) < 10 or ihdr[9] in (4, 6):  # cinza+alfa, RGBA
+                        return True
+                    f.seek(4, 1)  # CRC
+                elif kind == b"tRNS":
+                    return True
+                elif kind in (b"IDAT", b"IEND"):
+                    # tRNS sempre vem antes dos dados
+                    return False
+                else:
+                    f.seek(length + 4, 1)
+    except OSError:
+        return True
+
+
+@lru_cache(maxsize=1024)
 def _escape_text(text: str) -> str:
     return (
         text.replace("\\", "\\\\")
@@ -40,14 +171,44 @@ def _escape_text(text: str) -> str:
 def _quote_expr(expr: str) -> str:
     return f"'{expr}'"
 
+_W_VAR_RE = re.compile(r"\bw\b")
+_H_VAR_RE = re.compile(r"\bh\b")
+
 def _replace_expr_vars(expr: str, width: int, height: int) -> str:
-    expr = re.sub(r"\bw\b", str(width), expr)
-    expr = re.sub(r"\bh\b", str(height), expr)
+    expr = _W_VAR_RE.sub(str(width), expr)
+    expr = _H_VAR_RE.sub(str(height), expr)
     return expr
 
 def _scaled_image_size(path: str, target_w: int, target_h: int, zoom_enabled: bool) -> tuple[int, int]:
     if zoom_enabled:
         return target_w, target_h
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return target_w, target_h
+    return _probe_scaled_size(path, target_w, target_h, mtime_ns)
+
+
+def _fit_decrease(src_w: int, src_h: int, target_w: int, target_h: int) -> tuple[int, int]:
+    """Mesma conta do scale do ffmpeg com force_original_aspect_ratio=decrease."""
+    # av_rescale arredonda para o inteiro mais próximo (meio para cima)
+    fit_w = (target_h * src_w + src_h // 2) // src_h
+    fit_h = (target_w * src_h + src_w // 2) // src_w
+    return max(1, min(fit_w, target_w)), max(1, min(fit_h, target_h))
+
+
+@lru_cache(maxsize=1024)
+def _probe_scaled_size(path: str, target_w: int, target_h: int, mtime_ns: int) -> tuple[int, int]:
+    """Tamanho após scale=...:force_original_aspect_ratio=decrease (mtime na chave)."""
+    if PIL_OK:
+        try:
+            with Image.open(path) as img:
+                src_w, src_h = img.size
+            if src_w > 0 and src_h > 0:
+                return _fit_decrease(src_w, src_h, target_w, target_h)
+        except (OSError, ValueError):
+            pass  # formato que o Pillow não lê: pergunta ao ffprobe
+
     safe_path = path.replace("'", "\\'")
     cmd = [
         "ffprobe",
@@ -86,15 +247,18 @@ def _build_image_filter(
     isgif = _is_gif(image.path)
     allow_zoom = image.zoom_enabled and not (isgif and DISABLE_ZOOM_ON_GIFS)
     filters: List[str] = []
+    # imagem opaca escala no formato nativo (ex: yuvj420p do JPEG): converter
+    # para rgba só gastaria banda, o overlay volta para YUV de qualquer forma
+    to_rgba = "format=rgba," if _has_alpha(image.path) else ""
 
     if allow_zoom:
         canvas_w = int(math.ceil(target_w * ZOOM_END))
         canvas_h = int(math.ceil(target_h * ZOOM_END))
         zoom_den = max(1, total_frames - 1)
         filters += [
-            f"{input_label}setsar=1,format=rgba,"
+            f"{input_label}setsar=1,{to_rgba}"
             f"scale={canvas_w}:{canvas_h}:force_original_aspect_ratio=decrease[img0]",
-            f"color=c={BG_COLOR}:s={canvas_w}x{canvas_h}:r={fps}:d={duration},format=rgba[can]",
+            f"color=c={BG_COLOR}:s={canvas_w}x{canvas_h}:r={fps}:d={duration}[can]",
             f"[can][img0]overlay=(W-w)/2:(H-h)/2[pre]",
             f"[pre]zoompan="
             f"z='{ZOOM_START}+({ZOOM_END}-{ZOOM_START})*on/{zoom_den}':"
@@ -105,7 +269,7 @@ def _build_image_filter(
         ]
     else:
         filters.append(
-            f"{input_label}setsar=1,format=rgba,"
+            f"{input_label}setsar=1,{to_rgba}"
             f"scale={target_w}:{target_h}:force_original_aspect_ratio=decrease,"
             f"fps={fps}[img]"
         )
@@ -177,11 +341,20 @@ def render_clip(spec: ClipSpec, out: str) -> List[str]:
 
     inputs: List[str] = []
 
-    for image in spec.images:
+    # Uma entrada por arquivo: a mesma imagem em vários slots é decodificada
+    # uma vez e o grafo usa o mesmo [k:v] em cada cadeia. Imagens além dos
+    # slots do layout são ignoradas e nem chegam a ser abertas.
+    input_of_path: Dict[str, int] = {}
+    for image in spec.images[: len(layout.image_slots)]:
+        if image.path in input_of_path:
+            continue
+        input_of_path[image.path] = len(input_of_path)
         if _is_gif(image.path):
             inputs += ["-stream_loop", "-1", "-ignore_loop", "0", "-i", image.path]
         else:
-            inputs += ["-loop", "1", "-framerate", str(spec.fps), "-i", image.path]
+            # imagem estática: decodifica 1x por segundo; quem repete os frames
+            # na taxa do clip é o fps=/overlay depois do scale
+            inputs += ["-loop", "1", "-framerate", "1", "-i", image.path]
 
     inputs += [
         "-f",
@@ -191,13 +364,15 @@ def render_clip(spec: ClipSpec, out: str) -> List[str]:
     ]
 
     if spec.stickman:
-        inputs += ["-loop", "1", "-framerate", str(spec.fps), "-i", spec.stickman.path]
+        inputs += ["-loop", "1", "-framerate", "1", "-i", spec.stickman.path]
 
-    bg_i = len(spec.images)
+    bg_i = len(input_of_path)
     stick_i = bg_i + 1 if spec.stickman else None
 
-    filters: List[str] = [f"[{bg_i}:v]format=rgba[bg]"]
-    cur = "[bg]"
+    # fundo/canvas sem format=rgba: o overlay (format=yuv420 por padrão)
+    # converteria de volta para YUV de qualquer forma, a cada frame
+    filters: List[str] = []
+    cur = f"[{bg_i}:v]"
 
     for idx, image in enumerate(spec.images):
         if idx >= len(layout.image_slots):
@@ -209,7 +384,7 @@ def render_clip(spec: ClipSpec, out: str) -> List[str]:
         slot = layout.image_slots[idx]
         filters += _build_image_filter(
             image=image,
-            input_label=f"[{idx}:v]",
+            input_label=f"[{input_of_path[image.path]}:v]",
             duration=spec.duration,
             total_frames=total_frames,
             target_w=slot.target_w,
@@ -240,8 +415,12 @@ def render_clip(spec: ClipSpec, out: str) -> List[str]:
                 text_x, text_y = _apply_slide_text(text_x, text_y, image.slide_direction, spec.fps)
             anchored_text_exprs = (text_x, text_y)
 
+        # sem slide a posição é constante: avalia x/y uma vez (eval=init)
+        # em vez de reinterpretar as expressões a cada frame
+        overlay_eval = "" if image.slide_direction else ":eval=init"
         filters.append(
-            f"{cur}[img]overlay=x={_quote_expr(final_x)}:y={_quote_expr(final_y)}:shortest=1[v{idx}]"
+            f"{cur}[img]overlay=x={_quote_expr(final_x)}:y={_quote_expr(final_y)}"
+            f"{overlay_eval}:shortest=1[v{idx}]"
         )
         cur = f"[v{idx}]"
 
@@ -263,7 +442,7 @@ def render_clip(spec: ClipSpec, out: str) -> List[str]:
             stickman.anim, total_frames, stickman_x, stickman_y
         )
         filters.append(
-            f"[{stick_i}:v]setsar=1,format=rgba,"
+            f"[{stick_i}:v]setsar=1,format=rgba,fps={spec.fps},"
             f"scale='{STICKMAN_SIZE}*({scale_expr})':'{STICKMAN_SIZE}*({scale_expr})':eval=frame"
             f"[stick]"
         )
@@ -292,9 +471,18 @@ def render_clip(spec: ClipSpec, out: str) -> List[str]:
         )
         cur = "[vspeech]"
 
+    if not filters:
+        # clip só com o fundo: -map precisa de um rótulo de saída do grafo
+        filters.append(f"{cur}null[bg]")
+        cur = "[bg]"
+
     cmd = [
         "ffmpeg",
         "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-nostats",
         *inputs,
         "-filter_complex",
         ";".join(filters),
@@ -304,24 +492,29 @@ def render_clip(spec: ClipSpec, out: str) -> List[str]:
         str(total_frames),
         "-t",
         str(spec.duration),
-        "-c:v",
-        "libx264",
-        "-preset",
-        "fast",
-        "-crf",
-        "23",
+        # parâmetros fixos iguais em todos os clips: o concat final só
+        # consegue fazer stream-copy (-c:v copy) se todos baterem
+        *_encoder_args(spec.encoder, spec.fps),
+        "-r",
+        str(spec.fps),
+        "-video_track_timescale",
+        "90000",
         "-pix_fmt",
         "yuv420p",
-        out,
     ]
-
-    r = subprocess.run(cmd, capture_output=True, text=True)
-    if r.returncode != 0:
+    if spec.ffmpeg_threads:
+        # vários clips renderizando juntos: limita as threads de cada ffmpeg
+        cmd += ["-threads", str(spec.ffmpeg_threads)]
+        cmd[1:1] = ["-filter_complex_threads", str(spec.ffmpeg_threads)]
+    cmd.append(out)
+
+    returncode, stderr = _run_ffmpeg(cmd)
+    if returncode != 0:
         raise RuntimeError(
             "FFmpeg falhou.\n"
             f"Arquivo: {out}\n"
             f"Comando: {' '.join(cmd[:20])} ...\n"
-            f"Stderr:\n{r.stderr}"
+            f"Stderr:\n{stderr}"
         )
 
     return warnings